@@ -0,0 +1,59 @@
+import asyncio
+import inspect
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, Callable, Optional
+
+ABUILD_MAX_THREADS = int(os.environ.get("ABUILD_MAX_THREADS", "256"))
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+_thread_local = threading.local()
+
+
+def _executor() -> ThreadPoolExecutor:
+    """
+    dedicated pool, cause asyncio's default executor only has min(32, cpus+4) threads
+    most of them are just waiting (on locks, downloads, other processes) so there can be many
+    """
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=ABUILD_MAX_THREADS, thread_name_prefix="abuild"
+            )
+    return _EXECUTOR
+
+
+async def run_in_build_thread(fun: Callable[[], Any]) -> Any:
+    """
+    runs blocking (sync) fun in a thread, coroutines created within that thread (see run_maybe_async) are run in the calling event-loop
+    the thread runs in a copy of the caller's context, so it sees the caller's cancellation (see build_cancellation)
+    """
+    loop = asyncio.get_running_loop()
+
+    def run_with_loop():
+        _thread_local.loop = loop
+        try:
+            return fun()
+        finally:
+            _thread_local.loop = None
+
+    return await loop.run_in_executor(_executor(), copy_context().run, run_with_loop)
+
+
+def run_maybe_async(fun: Callable[[], Any]) -> Any:
+    """
+    allows to call sync or async methods (like _build_self or _build_cache) from sync code
+    if called within run_in_build_thread the coroutine runs in the event-loop of abuild, otherwise in a new event-loop
+    """
+    o = fun()
+    if inspect.iscoroutine(o):
+        loop = getattr(_thread_local, "loop", None)
+        if loop is not None:
+            o = asyncio.run_coroutine_threadsafe(o, loop).result()
+        else:
+            o = asyncio.run(o)
+    return o
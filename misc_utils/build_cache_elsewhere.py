@@ -7,8 +7,9 @@ from datetime import datetime
 from typing import Any, Union, TypeVar, Generic, ClassVar, Iterable, Iterator, Optional
 
 import sys
-from time import sleep
 
+from misc_utils.build_cancellation import sleep_cancellable
+from misc_utils.build_durations import critical_path_first, critical_path_seconds
 from misc_utils.buildable import Buildable
 from misc_utils.cached_data import CachedData
 from misc_utils.dataclass_utils import (
@@ -66,7 +67,7 @@ class BuildCacheElseWhere(Buildable):  # Generic[T]
     def _tear_down_self(self) -> Any:
         # q = Queue(self.callback_dir, serializer=json_serializer)
         wait_message = f"waiting for {self.task.name} {type(self.task)}"
-        # TODO: fail-case? currently in case of failure it hangs forever!
+        # TODO: fail-case? currently in case of failure it hangs forever! unless the build is cancelled, see: cancellation_scope
         for k in itertools.count():
             if self.task_is_done():
                 break
@@ -77,7 +78,7 @@ class BuildCacheElseWhere(Buildable):  # Generic[T]
                     f"\ralready waiting for {k*self.teardown_sleep_time} seconds"
                 )
                 sys.stdout.flush()
-                sleep(self.teardown_sleep_time)
+                sleep_cancellable(self.teardown_sleep_time)
 
         return super()._tear_down_self()
 
@@ -86,6 +87,7 @@ class BuildCacheElseWhere(Buildable):  # Generic[T]
 class FileLockQueuedCacheBuilder(BuildCacheElseWhere):
     """
     puts task in filelock queue
+    without explicit rank: first-come-first-serve, but a task is ranked earlier by its estimated critical-path-seconds
     """
 
     rank: Optional[int] = None
@@ -99,6 +101,7 @@ class FileLockQueuedCacheBuilder(BuildCacheElseWhere):
         if self.rank is None:
             rank = round(
                 (datetime.now() - datetime(2022, 1, 1, 0, 0, 0)).total_seconds()
+                - critical_path_seconds(self.task)
             )
         else:
             rank = self.rank
@@ -121,6 +124,7 @@ class FileLockQueuedCacheBuilder(BuildCacheElseWhere):
 @dataclass
 class ParallelFileLockQueuedCacheBuilding(Buildable, Iterable[T]):
     tasks: list[T] = dataclasses.field(init=True, repr=True)
+    __built_by_self__: ClassVar[list[str]] = ["tasks"]
     queue_dir: Union[_UNDEFINED, PrefixSuffix] = UNDEFINED
     teardown_sleep_time: float = 10.0
 
@@ -141,11 +145,22 @@ class ParallelFileLockQueuedCacheBuilding(Buildable, Iterable[T]):
         ]
 
     def _build_self(self):
+        self._rank_by_critical_path()
         for k, task in enumerate(self.tasks):
             self.tasks[k] = task.build()
 
         self._tear_down()
 
+    def _rank_by_critical_path(self):
+        """
+        longest tasks first, without history by list position
+        not in __post_init__ cause that also runs when deserializing
+        """
+        ranked = critical_path_first([flq_task.task for flq_task in self.tasks])
+        id2rank = {id(t): k for k, t in enumerate(ranked)}
+        for flq_task in self.tasks:
+            flq_task.rank = id2rank[id(flq_task.task)]
+
     def _tear_down_all_chrildren(self):
         self.tasks = [x._tear_down() for x in self.tasks]
 
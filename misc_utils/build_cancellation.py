@@ -0,0 +1,115 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import sleep, time
+from typing import Iterator, Optional
+
+
+class BuildCancelled(Exception):
+    pass
+
+
+class BuildTimeout(BuildCancelled):
+    pass
+
+
+class CancellationToken:
+    """
+    cooperative cancellation: nothing gets killed, builds stop at their next check (raise_if_cancelled, sleep_cancellable)
+    a token is cancelled if cancel was called, its deadline passed or its parent is cancelled
+    """
+
+    def __init__(
+        self,
+        parent: Optional["CancellationToken"] = None,
+        timeout: Optional[float] = None,
+        label: str = "build",
+    ):
+        self.parent = parent
+        self.deadline = time() + timeout if timeout is not None else None
+        self.label = label
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def timed_out(self) -> bool:
+        return self.deadline is not None and time() > self.deadline
+
+    @property
+    def is_cancelled(self) -> bool:
+        return (
+            self._event.is_set()
+            or self.timed_out
+            or (self.parent is not None and self.parent.is_cancelled)
+        )
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise BuildCancelled(f"{self.label}: {self.reason}")
+        elif self.timed_out:
+            raise BuildTimeout(f"{self.label}: deadline passed")
+        elif self.parent is not None:
+            self.parent.raise_if_cancelled()
+
+    def sleep(self, seconds: float):
+        """
+        like time.sleep but wakes up (and raises) as soon as cancelled
+        """
+        until = time() + seconds
+        while (remaining := until - time()) > 0:
+            self.raise_if_cancelled()
+            self._event.wait(min(remaining, 0.1))
+        self.raise_if_cancelled()
+
+    @contextmanager
+    def activate(self) -> Iterator["CancellationToken"]:
+        token = _CANCELLATION.set(self)
+        try:
+            yield self
+        finally:
+            _CANCELLATION.reset(token)
+
+
+_CANCELLATION: ContextVar[Optional[CancellationToken]] = ContextVar(
+    "_CANCELLATION", default=None
+)
+
+
+def current_cancellation() -> Optional[CancellationToken]:
+    return _CANCELLATION.get()
+
+
+@contextmanager
+def cancellation_scope(
+    timeout: Optional[float] = None, label: str = "build"
+) -> Iterator[CancellationToken]:
+    """
+    everything built within gets cancelled once timeout (in seconds) passed, or token.cancel() was called, or any outer scope got cancelled
+    with cancellation_scope(timeout=3600) as token:
+        graph.build()
+    NOT shared across processes (see PARALLEL_BUILD.use_processes)
+    """
+    with CancellationToken(current_cancellation(), timeout, label).activate() as token:
+        yield token
+
+
+def raise_if_cancelled():
+    """
+    call this within long-running _build_self/_build_cache implementations
+    """
+    token = current_cancellation()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def sleep_cancellable(seconds: float):
+    token = current_cancellation()
+    if token is not None:
+        token.sleep(seconds)
+    else:
+        sleep(seconds)
@@ -0,0 +1,236 @@
+import atexit
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import time
+from typing import Any, Optional
+
+from data_io.readwrite_files import read_json, write_json
+from misc_utils.build_plan import BLOCKED, BUILD, LOAD
+from misc_utils.dataclass_utils import hash_dataclass
+from misc_utils.utils import just_try
+
+BUILD_DURATIONS_FILE = os.environ.get("BUILD_DURATIONS_FILE", None)
+BUILD_DURATIONS_FILE_NAME = "build_durations.json"
+FLUSH_SECONDS = 10.0
+MAX_COUNT = 100  # older measurements fade out: a moving average over the last ~100
+MAX_NODES = 10_000  # per-node estimates, the least recently measured ones are dropped
+
+CLASSES = "classes"
+NODES = "nodes"
+
+
+def _merge(a: list[float], b: list[float]) -> list[float]:
+    """
+    [count, mean_seconds, last_measured] + [count, mean_seconds, last_measured]
+    """
+    count = a[0] + b[0]
+    mean = (a[0] * a[1] + b[0] * b[1]) / count if count > 0 else 0.0
+    return [min(count, MAX_COUNT), mean, max(a[2], b[2])]
+
+
+def _add(aggregates: dict[str, list[float]], key: str, aggregate: list[float]):
+    aggregates[key] = _merge(aggregates.get(key, [0, 0.0, 0.0]), aggregate)
+
+
+def _hash_of(node: Any) -> Optional[str]:
+    return just_try(lambda: hash_dataclass(node), default=None)
+
+
+class BuildDurations:
+    """
+    persistent estimates of how long nodes take to build (_build_cache) or to load from cache
+    aggregates [count, mean_seconds, last_measured] in a small json-file
+        per node (class + hash_dataclass + phase), at most MAX_NODES, so siblings of the same class can be told apart
+        per class and phase, the estimate for nodes that were never measured
+    measurements are collected in memory and merged into the file at most every FLUSH_SECONDS (and at exit)
+        the file is rewritten atomically (temporary file + rename), so multiple processes can share it
+        a concurrent flush of another process might get lost, which is fine for estimates
+    """
+
+    def __init__(self, durations_file: str):
+        self.durations_file = durations_file
+        self._lock = threading.Lock()
+        self._aggregates: Optional[dict[str, dict[str, list[float]]]] = None
+        self._pending: dict[str, dict[str, list[float]]] = {CLASSES: {}, NODES: {}}
+        self._last_flush = time()
+
+    def _read(self) -> dict[str, dict[str, list[float]]]:
+        aggregates = (
+            just_try(lambda: read_json(self.durations_file), default=None)
+            if os.path.isfile(self.durations_file)
+            else None
+        )
+        if not isinstance(aggregates, dict) or set(aggregates.keys()) != {CLASSES, NODES}:
+            return {CLASSES: {}, NODES: {}}  # missing, broken or of an older format
+        return aggregates
+
+    def _maybe_load(self):
+        if self._aggregates is None:
+            self._aggregates = self._read()
+
+    def record(self, node: Any, phase: str, seconds: float):
+        class_key = f"{type(node).__name__}/{phase}"
+        hashed = _hash_of(node)
+        measured = [1, seconds, time()]
+        with self._lock:
+            self._maybe_load()
+            for aggregates in [self._aggregates, self._pending]:
+                _add(aggregates[CLASSES], class_key, measured)
+                if hashed is not None:
+                    _add(aggregates[NODES], f"{class_key}/{hashed}", measured)
+            due = time() - self._last_flush > FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {CLASSES: {}, NODES: {}}
+            self._last_flush = time()
+            if len(pending[CLASSES]) == 0:
+                return
+            aggregates = self._read()
+            for part in [CLASSES, NODES]:
+                for key, aggregate in pending[part].items():
+                    _add(aggregates[part], key, aggregate)
+            if len(aggregates[NODES]) > MAX_NODES:
+                recent = sorted(
+                    aggregates[NODES].items(), key=lambda kv: kv[1][2], reverse=True
+                )
+                aggregates[NODES] = dict(recent[:MAX_NODES])
+            self._aggregates = aggregates
+            os.makedirs(os.path.dirname(self.durations_file) or ".", exist_ok=True)
+            tmp_file = f"{self.durations_file}.{uuid.uuid4().hex[:8]}.tmp"
+            write_json(tmp_file, aggregates)
+            os.replace(tmp_file, self.durations_file)
+
+    def estimate(self, node: Any, phase: str) -> Optional[float]:
+        """
+        mean of the very same node, if it was never measured: mean of its class
+        """
+        class_key = f"{type(node).__name__}/{phase}"
+        hashed = _hash_of(node)
+        with self._lock:
+            self._maybe_load()
+            aggregate = (
+                self._aggregates[NODES].get(f"{class_key}/{hashed}", None)
+                if hashed is not None
+                else None
+            )
+            if aggregate is None:
+                aggregate = self._aggregates[CLASSES].get(class_key, None)
+        return aggregate[1] if aggregate is not None else None
+
+
+_FILE2DURATIONS: dict[str, BuildDurations] = {}
+_LOCK = threading.Lock()
+
+
+def build_durations() -> Optional[BuildDurations]:
+    """
+    env-var BUILD_DURATIONS_FILE or BASE_PATHES["cache_root"]/build_durations.json, None if neither is set
+    """
+    from misc_utils.prefix_suffix import BASE_PATHES  # prefix_suffix imports buildable
+
+    durations_file = BUILD_DURATIONS_FILE
+    if durations_file is None and "cache_root" in BASE_PATHES:
+        durations_file = f"{BASE_PATHES['cache_root']}/{BUILD_DURATIONS_FILE_NAME}"
+    if durations_file is None:
+        return None
+    with _LOCK:
+        if durations_file not in _FILE2DURATIONS:
+            _FILE2DURATIONS[durations_file] = BuildDurations(durations_file)
+    return _FILE2DURATIONS[durations_file]
+
+
+def _flush_all():
+    for durations in list(_FILE2DURATIONS.values()):
+        just_try(durations.flush, verbose=True)
+
+
+atexit.register(_flush_all)
+
+
+def record_duration(node: Any, phase: str, seconds: float):
+    durations = build_durations()
+    if durations is not None:
+        durations.record(node, phase, seconds)
+
+
+def estimate_seconds(node: Any, status: str) -> Optional[float]:
+    """
+    can be used as estimate_seconds of Buildable.plan
+    """
+    durations = build_durations()
+    if durations is None or status not in [LOAD, BUILD, BLOCKED]:
+        return None
+    return durations.estimate(node, LOAD if status == LOAD else BUILD)
+
+
+_CRITICAL_PATHS: ContextVar[Optional[dict[int, tuple[Any, float]]]] = ContextVar(
+    "_CRITICAL_PATHS", default=None
+)
+
+
+@contextmanager
+def critical_path_scope():
+    """
+    memoizes critical_path_seconds within the build of an entire graph (see build_independent)
+    so every node gets its _plan_status (hashing, stats) estimated once, not once per ancestor
+    """
+    if _CRITICAL_PATHS.get() is not None or build_durations() is None:
+        yield
+        return
+    token = _CRITICAL_PATHS.set({})
+    try:
+        yield
+    finally:
+        _CRITICAL_PATHS.reset(token)
+
+
+def critical_path_seconds(node: Any) -> float:
+    """
+    estimated seconds of the longest chain of not-yet-cached nodes below (and including) node
+    children are assumed to be built in parallel, unknown durations count as 0
+    """
+    if build_durations() is None:
+        return 0.0
+    memo = _CRITICAL_PATHS.get()
+    id2seconds = memo if memo is not None else {}  # values keep the objects alive, ids stay unique
+
+    def longest(obj: Any) -> float:
+        if id(obj) in id2seconds:
+            return id2seconds[id(obj)][1]
+        id2seconds[id(obj)] = (obj, 0.0)  # guards against cycles
+        if getattr(obj, "__plan_ignore__", True):
+            return 0.0
+        status = obj._plan_status()
+        runtime_fields = obj._runtime_field_names() if status == LOAD else ()
+        children = [
+            c
+            for k, c in obj._children_to_plan()
+            if status == BUILD or k.split(".")[0] in runtime_fields
+        ]
+        seconds = (estimate_seconds(obj, status) or 0.0) + max(
+            (longest(c) for c in children), default=0.0
+        )
+        id2seconds[id(obj)] = (obj, seconds)
+        return seconds
+
+    return longest(node)
+
+
+def critical_path_first(objs: list[Any]) -> list[Any]:
+    """
+    longest-processing-time-first: start the nodes on the longest critical paths first
+    stable: without any history the order is unchanged
+    """
+    if build_durations() is None:
+        return objs
+    with critical_path_scope():  # siblings sharing sub-graphs
+        seconds = [critical_path_seconds(o) for o in objs]
+    order = sorted(range(len(objs)), key=lambda k: -seconds[k])
+    return [objs[k] for k in order]
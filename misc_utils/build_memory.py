@@ -0,0 +1,193 @@
+import atexit
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+from typing import Any, Optional
+
+from data_io.readwrite_files import write_file
+from misc_utils.build_tracing import node_label
+from misc_utils.utils import build_markdown_table_from_dicts
+
+BUILD_MEMORY_REPORT = os.environ.get("BUILD_MEMORY_REPORT", None)
+
+MB = 1024**2
+
+
+def rss_bytes() -> Optional[int]:
+    """
+    resident set size of this process, None if not on linux
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+@dataclass
+class MemoryRecord:
+    node: str
+    phase: str
+    peak_mb: float  # tracemalloc: peak of python-allocations above the level at start of the phase
+    retained_mb: float  # tracemalloc: still allocated after the phase
+    peak_rss_mb: Optional[float] = None  # sampled, includes memory not traced by tracemalloc (numpy, torch, ...)
+    rss_delta_mb: Optional[float] = None
+
+
+@dataclass
+class _Frame:
+    start: int
+    peak: int
+    start_rss: Optional[int]
+    peak_rss: Optional[int]
+
+
+class BuildMemoryProfiler:
+    """
+    records peak and retained memory per node for the phases: build_self, load_cached_data and post_build_setup
+    phases are inclusive: a BuildableList's build_self contains the builds of its items
+    peaks are attributed correctly for sequential builds, parallel builds share a single tracemalloc-peak
+
+    with BuildMemoryProfiler() as profiler:
+        graph.build()
+    print(profiler.report())
+
+    or set env-var BUILD_MEMORY_REPORT=memory_report.md to profile everything (all threads) until the process exits
+    entered ones are active within the current context (contextvars), threads of parallel builds inherit it, unrelated threads do not see it
+    tracemalloc slows down allocations considerably, so only use it for debugging
+    """
+
+    def __init__(
+        self, report_file: Optional[str] = None, rss_sample_interval: float = 0.1
+    ):
+        self.report_file = report_file
+        self.rss_sample_interval = rss_sample_interval
+        self.records: list[MemoryRecord] = []
+        self._lock = threading.Lock()
+        self._open_frames: dict[int, _Frame] = {}
+        self._stop_sampling = threading.Event()
+        self._started_tracemalloc = False
+
+    def __enter__(self) -> "BuildMemoryProfiler":
+        self._start()
+        _PROFILERS.set(_PROFILERS.get() + (self,))
+        return self
+
+    def __exit__(self, exc_type=None, exc_val=None, exc_tb=None):
+        _PROFILERS.set(tuple(p for p in _PROFILERS.get() if p is not self))
+        self._stop()
+
+    def _start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._stop_sampling.clear()
+        self._sampler = threading.Thread(
+            target=self._sample_rss, name="rss_sampler", daemon=True
+        )
+        self._sampler.start()
+
+    def _stop(self):
+        self._stop_sampling.set()
+        self._sampler.join()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        if self.report_file is not None:
+            write_file(self.report_file, self.report())
+
+    def _sample_rss(self):
+        while not self._stop_sampling.wait(self.rss_sample_interval):
+            rss = rss_bytes()
+            if rss is None:
+                break
+            with self._lock:
+                for frame in self._open_frames.values():
+                    frame.peak_rss = max(frame.peak_rss, rss)
+
+    @contextmanager
+    def span(self, node: Any, phase: str):
+        current, peak = tracemalloc.get_traced_memory()
+        stack = _FRAMES.get()
+        if len(stack) > 0:  # reset_peak would make the parent lose its peak so far
+            stack[-1].peak = max(stack[-1].peak, peak)
+        tracemalloc.reset_peak()
+        rss = rss_bytes()
+        frame = _Frame(start=current, peak=current, start_rss=rss, peak_rss=rss)
+        token = _FRAMES.set(stack + (frame,))
+        with self._lock:
+            self._open_frames[id(frame)] = frame
+        try:
+            yield
+        finally:
+            _FRAMES.reset(token)
+            current, peak = tracemalloc.get_traced_memory()
+            rss = rss_bytes()
+            has_rss = rss is not None
+            with self._lock:
+                del self._open_frames[id(frame)]
+                frame.peak = max(frame.peak, peak)
+                if len(stack) > 0:
+                    stack[-1].peak = max(stack[-1].peak, frame.peak)
+                self.records.append(
+                    MemoryRecord(
+                        node=node_label(node),
+                        phase=phase,
+                        peak_mb=(frame.peak - frame.start) / MB,
+                        retained_mb=(current - frame.start) / MB,
+                        peak_rss_mb=max(frame.peak_rss, rss) / MB if has_rss else None,
+                        rss_delta_mb=(rss - frame.start_rss) / MB if has_rss else None,
+                    )
+                )
+
+    def heaviest(self, top_k: int = 20, by: str = "peak_mb") -> list[MemoryRecord]:
+        with self._lock:
+            records = list(self.records)
+        return sorted(records, key=lambda r: -(getattr(r, by) or 0.0))[:top_k]
+
+    def report(self, top_k: int = 20, by: str = "peak_mb") -> str:
+        heaviest = self.heaviest(top_k, by)
+        if len(heaviest) == 0:
+            return "nothing recorded"
+        return build_markdown_table_from_dicts(
+            [asdict(r) for r in heaviest],
+            col_names=[
+                "node",
+                "phase",
+                "peak_mb",
+                "retained_mb",
+                "peak_rss_mb",
+                "rss_delta_mb",
+            ],
+        )
+
+
+_PROFILERS: ContextVar[tuple[BuildMemoryProfiler, ...]] = ContextVar(
+    "_PROFILERS", default=()
+)
+_PROCESS_PROFILER: Optional[BuildMemoryProfiler] = (
+    BuildMemoryProfiler(BUILD_MEMORY_REPORT) if BUILD_MEMORY_REPORT is not None else None
+)
+_FRAMES: ContextVar[tuple[_Frame, ...]] = ContextVar("_FRAMES", default=())
+
+
+def current_memory_profiler() -> Optional[BuildMemoryProfiler]:
+    profilers = _PROFILERS.get()
+    return profilers[-1] if len(profilers) > 0 else _PROCESS_PROFILER
+
+
+def memory_span(node: Any, phase: str):
+    """
+    no-op if no BuildMemoryProfiler is active
+    """
+    profiler = current_memory_profiler()
+    if profiler is None:
+        return nullcontext()
+    return profiler.span(node, phase)
+
+
+if _PROCESS_PROFILER is not None:
+    _PROCESS_PROFILER._start()
+    atexit.register(_PROCESS_PROFILER._stop)
@@ -0,0 +1,99 @@
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Optional
+
+from misc_utils.utils import build_markdown_table_from_dicts, just_try
+
+READY = "ready"  # nothing to do: built already or valid data exists
+LOAD = "load"  # found in cache, would be loaded
+BUILD = "build"
+BLOCKED = "blocked"  # other process holds lock-files, would wait for it
+SKIP = "skip"  # not touched, cause some ancestor is ready or loaded from cache
+
+EstimateSeconds = Callable[[Any, str], Optional[float]]
+
+
+@dataclass
+class PlannedNode:
+    path: str
+    clazz: str
+    status: str
+    name: Optional[str] = None
+    cache_dir: Optional[str] = None
+    estimated_seconds: Optional[float] = None
+
+
+@dataclass
+class BuildPlan:
+    """
+    result of a dry-run build, see: Buildable.plan
+    """
+
+    nodes: list[PlannedNode]
+
+    def by_status(self, status: str) -> list[PlannedNode]:
+        return [n for n in self.nodes if n.status == status]
+
+    @property
+    def estimated_seconds(self) -> Optional[float]:
+        """
+        sum over all nodes that would be loaded or built, None if not a single estimate is available
+        """
+        estimates = [
+            n.estimated_seconds
+            for n in self.nodes
+            if n.status in [LOAD, BUILD] and n.estimated_seconds is not None
+        ]
+        return sum(estimates) if len(estimates) > 0 else None
+
+    def __str__(self) -> str:
+        if len(self.nodes) == 0:
+            return "empty plan"
+        return build_markdown_table_from_dicts(
+            [asdict(n) for n in self.nodes],
+            col_names=["path", "clazz", "name", "status", "estimated_seconds"],
+        )
+
+
+def _name_of(obj: Any) -> Optional[str]:
+    name = just_try(lambda: obj.name, default=None) if hasattr(obj, "name") else None
+    return name if isinstance(name, str) else None
+
+
+def plan_graph(
+    root: Any, estimate_seconds: Optional[EstimateSeconds] = None
+) -> BuildPlan:
+    """
+    walks the graph like Buildable.build would do, but does NOT build or load anything
+    nodes need to implement: __plan_ignore__, _plan_status, _planned_cache_dir, _children_to_plan and _runtime_field_names
+    estimate_seconds: (node, status) -> seconds, for example based on historical durations
+    """
+    nodes: list[PlannedNode] = []
+    visited: set[int] = set()
+
+    def visit(obj: Any, path: str, is_skipped: bool):
+        if id(obj) in visited or obj.__plan_ignore__:
+            return
+        visited.add(id(obj))
+        status = SKIP if is_skipped else obj._plan_status()
+        estimate = (
+            estimate_seconds(obj, status)
+            if estimate_seconds is not None and status in [LOAD, BUILD]
+            else None
+        )
+        nodes.append(
+            PlannedNode(
+                path=path,
+                clazz=type(obj).__name__,
+                status=status,
+                name=_name_of(obj),
+                cache_dir=obj._planned_cache_dir(),
+                estimated_seconds=estimate,
+            )
+        )
+        runtime_fields = obj._runtime_field_names() if status == LOAD else ()
+        for key, child in obj._children_to_plan():
+            is_needed = status == BUILD or key.split(".")[0] in runtime_fields
+            visit(child, f"{path}.{key}", is_skipped=not is_needed)
+
+    visit(root, type(root).__name__, is_skipped=False)
+    return BuildPlan(nodes)
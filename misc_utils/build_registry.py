@@ -0,0 +1,172 @@
+import asyncio
+import gc
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+from misc_utils.build_cancellation import raise_if_cancelled
+from misc_utils.utils import just_try
+
+BUILD_REGISTRY_GB = os.environ.get("BUILD_REGISTRY_GB", None)
+
+GB = 1024**3
+
+
+class BuildRegistry:
+    """
+    memoizes built (or loaded from cache) nodes across builds within one process, keyed by their _registry_key (CachedData: its cache-location)
+    a later build of an equal config gets the very same instance: no reading of dataclass.json, no _post_build_setup, no loading of its children
+    registered instances are shared! do not mutate them
+
+    memory-bounded: least recently used entries are evicted once the sum of their estimated sizes exceeds max_bytes
+        size of an entry is estimated by the node's _registry_bytes (CachedData: size of its cache-dir)
+        evicted entries are freed as soon as nobody else references them
+
+    with BuildRegistry(max_bytes=20 * GB):
+        serve_requests()
+
+    or set env-var BUILD_REGISTRY_GB=20 to have a registry for the entire process (all threads)
+    entered ones are active within the current context (contextvars), threads of parallel builds inherit it, unrelated threads do not see it
+    NOT shared across processes (see PARALLEL_BUILD.use_processes)
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, max_entries: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._key2future: OrderedDict[str, Future] = OrderedDict()  # least recently used first
+        self._key2bytes: dict[str, int] = {}
+
+    def __enter__(self) -> "BuildRegistry":
+        _REGISTRIES.set(_REGISTRIES.get() + (self,))
+        return self
+
+    def __exit__(self, exc_type=None, exc_val=None, exc_tb=None):
+        _REGISTRIES.set(tuple(r for r in _REGISTRIES.get() if r is not self))
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._key2future.clear()
+            self._key2bytes.clear()
+        gc.collect()
+
+    @property
+    def num_bytes(self) -> int:
+        return sum(self._key2bytes.values())
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._key2future
+
+    def discard(self, key: str):
+        """
+        a later build of this key builds (and registers) anew, waiters of a running build still get its result
+        """
+        with self._lock:
+            self._key2future.pop(key, None)
+            self._key2bytes.pop(key, None)
+
+    def _get_or_create_future(self, key: str) -> tuple[Future, bool]:
+        with self._lock:
+            future = self._key2future.get(key, None)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._key2future[key] = future
+            else:
+                self._key2future.move_to_end(key)
+        return future, is_owner
+
+    def _over_budget(self) -> bool:
+        return (self.max_bytes is not None and self.num_bytes > self.max_bytes) or (
+            self.max_entries is not None and len(self._key2bytes) > self.max_entries
+        )
+
+    def _register(self, key: str, future: Future, o: Any, size_fun: Callable[[], int]):
+        num_bytes = just_try(size_fun, default=0)
+        future.set_result(o)
+        num_evicted = 0
+        with self._lock:
+            self._key2bytes[key] = num_bytes
+            for k in list(self._key2future.keys()):  # least recently used first
+                if not self._over_budget():
+                    break
+                if k == key or k not in self._key2bytes:
+                    continue  # just registered or still building
+                del self._key2future[k], self._key2bytes[k]
+                num_evicted += 1
+        if num_evicted > 0:
+            gc.collect()
+
+    def _unregister(self, key: str, future: Future, e: BaseException):
+        with self._lock:
+            self._key2future.pop(key, None)
+        future.set_exception(e)
+
+    def _wait(self, future: Future) -> Any:
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except TimeoutError:
+                raise_if_cancelled()  # the other thread might hang
+
+    def build_once(
+        self,
+        key: str,
+        build_fun: Callable[[], Any],
+        size_fun: Callable[[], int],
+        while_waiting: Callable[[], Any] = nullcontext,
+    ) -> Any:
+        """
+        while_waiting: context-manager that is entered while waiting for some other thread to build the same node
+        """
+        future, is_owner = self._get_or_create_future(key)
+        if not is_owner:
+            with while_waiting():
+                return self._wait(future)
+        try:
+            o = build_fun()
+        except BaseException as e:
+            self._unregister(key, future, e)
+            raise
+        self._register(key, future, o, size_fun)
+        return o
+
+    async def abuild_once(
+        self,
+        key: str,
+        abuild_fun: Callable[[], Awaitable[Any]],
+        size_fun: Callable[[], int],
+    ) -> Any:
+        """
+        asyncio-version of build_once
+        """
+        future, is_owner = self._get_or_create_future(key)
+        if not is_owner:
+            return await asyncio.wrap_future(future)
+        try:
+            o = await abuild_fun()
+        except BaseException as e:
+            self._unregister(key, future, e)
+            raise
+        self._register(key, future, o, size_fun)
+        return o
+
+
+_REGISTRIES: ContextVar[tuple[BuildRegistry, ...]] = ContextVar(
+    "_REGISTRIES", default=()
+)
+_PROCESS_REGISTRY: Optional[BuildRegistry] = (
+    BuildRegistry(max_bytes=int(float(BUILD_REGISTRY_GB) * GB))
+    if BUILD_REGISTRY_GB is not None
+    else None
+)
+
+
+def current_build_registry() -> Optional[BuildRegistry]:
+    registries = _REGISTRIES.get()
+    return registries[-1] if len(registries) > 0 else _PROCESS_REGISTRY
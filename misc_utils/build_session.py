@@ -0,0 +1,120 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, TimeoutError
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+from misc_utils.build_cancellation import raise_if_cancelled
+
+BUILD_DEDUP = os.environ.get("BUILD_DEDUP", "False").lower() != "false"
+
+
+class BuildSession:
+    """
+    memoizes nodes during the build of a graph, so that each distinct node is built (or loaded from cache) exactly once
+        - by identity: the very same object referenced by multiple parents
+        - by a node's _build_session_key (for CachedData: class + hash_dataclass + cache_base), equal configs at different places of the graph
+    every parent gets the very same built object (shape-shifting still works)
+
+    with BuildSession():
+        graph.build()
+
+    or set env-var BUILD_DEDUP=True to automatically open a session for every top-level build
+    active within the current context (contextvars), threads of parallel builds inherit it, unrelated threads do not see it
+    NOT shared across processes (see PARALLEL_BUILD.use_processes)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key2future: dict[Any, Future] = {}
+        self._keep_alive: list[Any] = []  # object-ids are only unique while object is alive
+
+    def __enter__(self) -> "BuildSession":
+        _SESSIONS.set(_SESSIONS.get() + (self,))
+        return self
+
+    def __exit__(self, exc_type=None, exc_val=None, exc_tb=None):
+        _SESSIONS.set(tuple(s for s in _SESSIONS.get() if s is not self))
+        self._key2future.clear()
+        self._keep_alive.clear()
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self._keep_alive)
+
+    def _get_or_create_future(
+        self, obj: Any, session_key: Optional[str]
+    ) -> tuple[Future, bool]:
+        keys = [("id", id(obj))]
+        if session_key is not None:
+            keys.append(("key", session_key))
+
+        with self._lock:
+            future = next(
+                (self._key2future[k] for k in keys if k in self._key2future), None
+            )
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._keep_alive.append(obj)
+            for k in keys:  # duplicates found via key also get remembered by their id
+                self._key2future.setdefault(k, future)
+        return future, is_owner
+
+    def build_once(
+        self,
+        obj: Any,
+        session_key: Optional[str],
+        build_fun: Callable[[], Any],
+        while_waiting: Callable[[], Any] = nullcontext,
+    ) -> Any:
+        """
+        while_waiting: context-manager that is entered while waiting for some other thread to build the same node
+        """
+        future, is_owner = self._get_or_create_future(obj, session_key)
+        if not is_owner:
+            with while_waiting():
+                while True:
+                    try:
+                        return future.result(timeout=0.1)
+                    except TimeoutError:
+                        raise_if_cancelled()  # the other thread might hang
+
+        try:
+            o = build_fun()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        future.set_result(o)
+        return o
+
+    async def abuild_once(
+        self,
+        obj: Any,
+        session_key: Optional[str],
+        abuild_fun: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        asyncio-version of build_once
+        """
+        future, is_owner = self._get_or_create_future(obj, session_key)
+        if not is_owner:
+            return await asyncio.wrap_future(future)
+
+        try:
+            o = await abuild_fun()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        future.set_result(o)
+        return o
+
+
+_SESSIONS: ContextVar[tuple[BuildSession, ...]] = ContextVar("_SESSIONS", default=())
+
+
+def current_build_session() -> Optional[BuildSession]:
+    sessions = _SESSIONS.get()
+    return sessions[-1] if len(sessions) > 0 else None
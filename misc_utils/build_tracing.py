@@ -0,0 +1,127 @@
+import atexit
+import os
+import threading
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Optional
+
+from data_io.readwrite_files import write_json
+from misc_utils.utils import just_try
+
+BUILD_TRACE_FILE = os.environ.get("BUILD_TRACE_FILE", None)
+
+
+def node_label(obj: Any) -> str:
+    name = just_try(lambda: obj.name, default=None) if hasattr(obj, "name") else None
+    clazz = type(obj).__name__
+    return f"{clazz}-{name}" if isinstance(name, str) else clazz
+
+
+class BuildTracer:
+    """
+    records a nested span for every node (and for the phases of a node like cache-check, lock-wait, _build_cache, ...)
+    spans are written in chrome-trace-format, open it with: chrome://tracing, https://ui.perfetto.dev or https://www.speedscope.app
+
+    with BuildTracer("build_trace.json"):
+        graph.build()
+
+    or set env-var BUILD_TRACE_FILE=build_trace.json to trace everything (all threads) until the process exits
+    entered ones are active within the current context (contextvars), threads of parallel builds inherit it, unrelated threads do not see it
+    """
+
+    def __init__(self, trace_file: Optional[str] = None):
+        self.trace_file = trace_file
+        self.events: list[dict] = []
+        self._lock = threading.Lock()
+        self._start = perf_counter()
+        self._thread_ids: dict[int, int] = {}
+
+    def __enter__(self) -> "BuildTracer":
+        _TRACERS.set(_TRACERS.get() + (self,))
+        return self
+
+    def __exit__(self, exc_type=None, exc_val=None, exc_tb=None):
+        _TRACERS.set(tuple(t for t in _TRACERS.get() if t is not self))
+        if self.trace_file is not None:
+            self.write(self.trace_file)
+
+    def _tid(self) -> int:
+        ident = threading.get_ident()
+        if ident not in self._thread_ids:
+            self._thread_ids[ident] = len(self._thread_ids)
+            self.events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "tid": self._thread_ids[ident],
+                    "args": {"name": threading.current_thread().name},
+                }
+            )
+        return self._thread_ids[ident]
+
+    @contextmanager
+    def span(self, name: str, category: str, **args):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            end = perf_counter()
+            with self._lock:
+                self.events.append(
+                    {
+                        "name": name,
+                        "cat": category,
+                        "ph": "X",
+                        "ts": (start - self._start) * 1e6,
+                        "dur": (end - start) * 1e6,
+                        "pid": os.getpid(),
+                        "tid": self._tid(),
+                        "args": args,
+                    }
+                )
+
+    def total_durations(self, category: str = "node") -> dict[str, float]:
+        """
+        seconds per node, sorted descending, for example: tracer.total_durations("lock_wait")
+        """
+        node2dur: dict[str, float] = {}
+        for e in self.events:
+            if e.get("cat") == category:
+                node = e["args"]["node"]
+                node2dur[node] = node2dur.get(node, 0.0) + e["dur"] / 1e6
+        return dict(sorted(node2dur.items(), key=lambda kv: -kv[1]))
+
+    def write(self, trace_file: str):
+        with self._lock:
+            events = list(self.events)
+        write_json(trace_file, {"traceEvents": events, "displayTimeUnit": "ms"})
+
+
+_TRACERS: ContextVar[tuple[BuildTracer, ...]] = ContextVar("_TRACERS", default=())
+_PROCESS_TRACER: Optional[BuildTracer] = (
+    BuildTracer(BUILD_TRACE_FILE) if BUILD_TRACE_FILE is not None else None
+)
+
+
+def current_tracer() -> Optional[BuildTracer]:
+    tracers = _TRACERS.get()
+    return tracers[-1] if len(tracers) > 0 else _PROCESS_TRACER
+
+
+def trace_span(node: Any, category: str = "node", **args):
+    """
+    no-op if no BuildTracer is active
+    category "node" spans the entire build of a node, others span a phase of it (cache_check, lock_wait, _build_cache, ...)
+    """
+    tracer = current_tracer()
+    if tracer is None:
+        return nullcontext()
+    label = node_label(node)
+    name = label if category == "node" else category
+    return tracer.span(name, category, node=label, **args)
+
+
+if _PROCESS_TRACER is not None:
+    atexit.register(_PROCESS_TRACER.write, BUILD_TRACE_FILE)
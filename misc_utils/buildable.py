@@ -1,14 +1,56 @@
+import asyncio
+import copy
 import dataclasses
+import gc
+import inspect
 import os
+import threading
+from collections import deque
+from concurrent.futures import (
+    FIRST_EXCEPTION,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import contextmanager, nullcontext
+from contextvars import copy_context
 from dataclasses import dataclass, fields
 from time import time
-from typing import Any, Generic, TypeVar, final
+from typing import (
+    Annotated,
+    Any,
+    Callable,
+    ClassVar,
+    Generic,
+    Iterator,
+    Optional,
+    TypeVar,
+    Union,
+    final,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
 
 from beartype import beartype
 
+from misc_utils.async_building import run_in_build_thread, run_maybe_async
+from misc_utils.build_cancellation import cancellation_scope, raise_if_cancelled
+from misc_utils.build_memory import current_memory_profiler, memory_span
+from misc_utils.build_durations import critical_path_first, critical_path_scope
+from misc_utils.build_plan import BUILD, READY, BuildPlan, EstimateSeconds, plan_graph
+from misc_utils.build_registry import current_build_registry
+from misc_utils.build_session import (
+    BUILD_DEDUP,
+    BuildSession,
+    current_build_session,
+)
+from misc_utils.build_tracing import current_tracer, node_label, trace_span
 from misc_utils.dataclass_utils import (
+    HASH_MEMO_KEY,
     all_undefined_must_be_filled,
 )
+from misc_utils.utils import just_try
 
 DEBUG = os.environ.get("DEBUG", "False").lower() != "false"
 DEBUG_MEMORY_LEAK = os.environ.get("DEBUG_MEMORY_LEAK", "False").lower() != "false"
@@ -16,6 +58,384 @@ if DEBUG_MEMORY_LEAK:
     print(f"DEBUGGING MODE in {__name__}")
 
 
+class _BuildSlots:
+    """
+    bounds the number of nodes that are "working" (_is_ready-check or _build_self) at the same time
+    reentrant per thread: a node that builds other nodes within its own _build_self does not need a second slot
+    """
+
+    def __init__(self, max_workers: int):
+        self._semaphore = threading.BoundedSemaphore(max_workers)
+        self._local = threading.local()
+
+    @property
+    def _depth(self) -> int:
+        return getattr(self._local, "depth", 0)
+
+    @contextmanager
+    def hold(self):
+        if self._depth == 0:
+            self._semaphore.acquire()
+        self._local.depth = self._depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                self._semaphore.release()
+
+    @contextmanager
+    def released(self):
+        """
+        while waiting for children (built by other threads) one must not block a slot, otherwise: dead-lock!
+        """
+        depth = self._depth
+        if depth > 0:
+            self._semaphore.release()
+            self._local.depth = 0
+        try:
+            yield
+        finally:
+            if depth > 0:
+                self._semaphore.acquire()
+                self._local.depth = depth
+
+
+class _ResourceBudget:
+    """
+    admits nodes only while the budget (for example: {"mem_gb": 60, "gpu": 1}) has room for their __build_resources__
+    resources not in the budget are unlimited, a node needing more than the entire budget gets all of it (runs alone)
+    reentrant per thread like _BuildSlots: nodes built within a node that holds resources are admitted right away
+    """
+
+    def __init__(self, budget: dict[str, float]):
+        self._budget = budget
+        self._available = dict(budget)
+        self._condition = threading.Condition()
+        self._local = threading.local()
+
+    @property
+    def _held(self) -> Optional[dict[str, float]]:
+        return getattr(self._local, "held", None)
+
+    def _acquire(self, needs: dict[str, float]):
+        with self._condition:
+            while not all(self._available[k] >= v for k, v in needs.items()):
+                self._condition.wait(timeout=0.1)
+                raise_if_cancelled()
+            for k, v in needs.items():
+                self._available[k] -= v
+        self._local.held = needs
+
+    def _release(self, needs: dict[str, float]):
+        self._local.held = None
+        with self._condition:
+            for k, v in needs.items():
+                self._available[k] += v
+            self._condition.notify_all()
+
+    def needs(self, resources: dict[str, float]) -> dict[str, float]:
+        """
+        what hold(resources) would have to acquire, empty if nothing (unbudgeted or already held by this thread)
+        """
+        if self._held is not None:
+            return {}
+        return {
+            k: min(v, self._budget[k]) for k, v in resources.items() if k in self._budget
+        }
+
+    @contextmanager
+    def hold(self, resources: dict[str, float]):
+        needs = self.needs(resources)
+        if len(needs) == 0:
+            yield
+            return
+        self._acquire(needs)
+        try:
+            yield
+        finally:
+            self._release(needs)
+
+    @contextmanager
+    def released(self):
+        held = self._held
+        if held is not None:
+            self._release(held)
+        try:
+            yield
+        finally:
+            if held is not None:
+                self._acquire(held)
+
+
+@dataclass
+class ParallelBuildConfig:
+    """
+    opt-in parallel building of independent children (fields of a node, items of BuildableList/BuildableDict)
+    max_workers: how many nodes of the entire graph are allowed to work at the same time, 1 means sequential (default)
+    use_processes: children are built in worker-processes, must be picklable, built children are pickled back (shape-shifting still works)
+        within a worker-process the child's sub-graph is built sequentially
+    resources: budget shared by all nodes, for example: {"mem_gb": 60, "gpu": 1}, nodes declare their needs in __build_resources__
+        a node is only admitted (to _is_ready-check or _build_self) while there is room for its needs
+        a named exclusive resource is simply a resource with budget 1, not accounted in worker-processes
+    """
+
+    max_workers: int = 1
+    use_processes: bool = False
+    resources: dict[str, float] = dataclasses.field(default_factory=dict)
+
+    def __post_init__(self):
+        assert self.max_workers >= 1, f"{self.max_workers=} must be >= 1"
+        self._slots = _BuildSlots(self.max_workers)
+        self._budget = _ResourceBudget(self.resources)
+
+    @property
+    def is_parallel(self) -> bool:
+        return self.max_workers > 1
+
+    @contextmanager
+    def hold_slot(self, resources: Optional[dict[str, float]] = None):
+        """
+        lock-order is always: budget, then slot -> nobody holds a slot while waiting for the budget, otherwise: dead-lock!
+        a node built within a node that already holds a slot (but not the budget) gives its slot back while waiting
+        """
+        if not self.is_parallel:
+            yield
+            return
+        resources = resources or {}
+        must_wait = len(self._budget.needs(resources)) > 0
+        with self._slots.released() if must_wait else nullcontext():
+            with self._budget.hold(resources), self._slots.hold():
+                yield
+
+    @contextmanager
+    def release_slot(self):
+        if not self.is_parallel:
+            yield
+            return
+        # exits in reverse: takes back the budget, then the slot (same lock-order as hold_slot)
+        with self._slots.released(), self._budget.released():
+            yield
+
+
+def _parse_resources(resources: str) -> dict[str, float]:
+    """
+    mem_gb=60,gpu=1 -> {"mem_gb": 60.0, "gpu": 1.0}
+    """
+    return {
+        k.strip(): float(v)
+        for k, v in (kv.split("=") for kv in resources.split(",") if len(kv) > 0)
+    }
+
+
+PARALLEL_BUILD = ParallelBuildConfig(
+    max_workers=int(os.environ.get("BUILD_MAX_WORKERS", "1")),
+    use_processes=os.environ.get("BUILD_WITH_PROCESSES", "False").lower() != "false",
+    resources=_parse_resources(os.environ.get("BUILD_RESOURCES", "")),
+)
+
+
+def current_parallel_build() -> ParallelBuildConfig:
+    """
+    PARALLEL_BUILD gets replaced by parallel_build, importing it directly would give a stale config
+    """
+    return PARALLEL_BUILD
+
+
+@contextmanager
+def parallel_build(
+    max_workers: int,
+    use_processes: bool = False,
+    resources: Optional[dict[str, float]] = None,
+):
+    """
+    with parallel_build(max_workers=32, resources={"mem_gb": 60}):
+        obj.build()
+    """
+    global PARALLEL_BUILD
+    before = PARALLEL_BUILD
+    PARALLEL_BUILD = ParallelBuildConfig(
+        max_workers=max_workers, use_processes=use_processes, resources=resources or {}
+    )
+    try:
+        yield PARALLEL_BUILD
+    finally:
+        PARALLEL_BUILD = before
+
+
+def _build_in_worker_process(obj: Any) -> Any:
+    global PARALLEL_BUILD
+    PARALLEL_BUILD = ParallelBuildConfig()  # no nested process-pools
+    return obj.build()
+
+
+def _built_nodes(obj: Any) -> Iterator[Any]:
+    """
+    the already built nodes of obj's graph, not descending into them
+    """
+    seen: set[int] = set()
+    todo = [obj]
+    while len(todo) > 0:
+        node = todo.pop()
+        if id(node) in seen or getattr(node, "__plan_ignore__", True):
+            continue
+        seen.add(id(node))
+        if node._was_built:
+            yield node
+        else:
+            todo.extend(child for _, child in node._children_to_plan())
+
+
+def _optional_build_features_are_on() -> bool:
+    """
+    parallel building, deduplication (BuildSession, BuildRegistry), tracing, memory-profiling
+    """
+    return (
+        PARALLEL_BUILD.is_parallel
+        or BUILD_DEDUP
+        or current_build_session() is not None
+        or current_build_registry() is not None
+        or current_tracer() is not None
+        or current_memory_profiler() is not None
+    )
+
+
+def build_independent(objs: list[Any]) -> list[Any]:
+    """
+    builds objects that do not depend on each other, returns the built (maybe shape-shifted) objects in same order
+    the very same object occurring multiple times is built only once
+    in parallel the ones on the longest critical path (see build_durations) are started first
+    and if one fails the others get cancelled (see build_cancellation), its error is raised without waiting for them to stop
+        siblings in worker-processes are not reached by the cancellation, they keep running in the background
+    """
+    distinct = list({id(o): o for o in objs}.values())
+    config = PARALLEL_BUILD
+    if not config.is_parallel or len(distinct) < 2:
+        id2built = {id(o): o.build() for o in distinct}
+    else:
+        with critical_path_scope():  # estimates of the sub-graphs are reused by the builds of the children
+            id2built = _build_in_parallel(distinct, config)
+    return [id2built[id(o)] for o in objs]
+
+
+def _build_in_parallel(distinct: list[Any], config: ParallelBuildConfig) -> dict[int, Any]:
+    distinct = critical_path_first(distinct)
+    max_workers = min(config.max_workers, len(distinct))
+    if config.use_processes:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        build_fun = _build_in_worker_process
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        build_fun = lambda o: o.build()
+
+    failed = False
+    with config.release_slot(), cancellation_scope(label="siblings") as siblings:
+        try:
+            futures = [
+                executor.submit(build_fun, o)
+                if config.use_processes
+                else executor.submit(copy_context().run, build_fun, o)  # threads do not inherit the cancellation
+                for o in distinct
+            ]
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            for f in done:
+                f.result()  # raises the first failure, without waiting for the others
+            return {id(o): f.result() for o, f in zip(distinct, futures)}
+        except BaseException as e:
+            failed = True
+            siblings.cancel(f"sibling failed with: {e}")
+            raise
+        finally:  # running siblings stop at their next cancellation-check, no need to wait for that
+            executor.shutdown(wait=not failed, cancel_futures=failed)
+
+
+async def abuild_independent(objs: list[Any]) -> list[Any]:
+    """
+    asyncio-version of build_independent
+    """
+    distinct = list({id(o): o for o in objs}.values())
+    with critical_path_scope(), cancellation_scope(label="siblings") as siblings:
+        distinct = critical_path_first(distinct)
+        tasks = [asyncio.ensure_future(o.abuild()) for o in distinct]
+        try:
+            built = await asyncio.gather(*tasks)
+        except BaseException as e:
+            siblings.cancel(f"sibling failed with: {e}")
+            for t in tasks:
+                t.cancel()
+            raise
+    id2built = {id(o): b for o, b in zip(distinct, built)}
+    return [id2built[id(o)] for o in objs]
+
+
+_NEVER_BUILDABLE = (str, bytes, int, float, bool, complex, type(None))
+_CONTAINER_TYPES = (list, tuple, dict)
+_CLASS2CHILD_FIELDS: dict[type, tuple[str, ...]] = {}
+
+
+def _can_hold_buildable(hint: Any) -> bool:
+    """
+    conservative: only if the type-hint is made of atomic types only (str, int, Optional[float], ...) it cannot hold a Buildable
+    """
+    if hint in _NEVER_BUILDABLE:
+        return False
+    origin = get_origin(hint)
+    if origin is Union:
+        return any(_can_hold_buildable(h) for h in get_args(hint))
+    if origin is Annotated:
+        return _can_hold_buildable(get_args(hint)[0])
+    return True
+
+
+def _child_field_names(clazz: type) -> tuple[str, ...]:
+    """
+    per-class "child plan": names of init-fields that can hold Buildables, computed once per class
+    """
+    names = _CLASS2CHILD_FIELDS.get(clazz, None)
+    if names is None:
+        hints = just_try(
+            lambda: get_type_hints(clazz, include_extras=True), default={}
+        )  # forward references might not be resolvable
+        names = tuple(
+            f.name
+            for f in fields(clazz)
+            if f.init
+            and f.name not in clazz.__built_by_self__
+            and _can_hold_buildable(hints.get(f.name, Any))
+        )
+        _CLASS2CHILD_FIELDS[clazz] = names
+    return names
+
+
+def _find_buildables(value: Any, path: str) -> Iterator[tuple[str, "Buildable"]]:
+    if isinstance(value, Buildable):
+        yield path, value
+    elif type(value) in _CONTAINER_TYPES:
+        items = value.items() if type(value) is dict else enumerate(value)
+        for k, v in items:
+            if type(v) not in _NEVER_BUILDABLE:
+                yield from _find_buildables(v, f"{path}.{k}")
+
+
+def _replace_built(value: Any, id2built: dict[int, Any]) -> Any:
+    """
+    lists and dicts are modified in-place (like BuildableList/BuildableDict do), tuples are replaced
+    """
+    if isinstance(value, Buildable):
+        return id2built.get(id(value), value)
+    elif type(value) is list:
+        for k, v in enumerate(value):
+            value[k] = _replace_built(v, id2built)
+    elif type(value) is dict:
+        for k, v in value.items():
+            value[k] = _replace_built(v, id2built)
+    elif type(value) is tuple:
+        new_tuple = tuple(_replace_built(v, id2built) for v in value)
+        if any(a is not b for a, b in zip(value, new_tuple)):
+            value = new_tuple
+    return value
+
+
 @dataclass # TODO: remove dataclass here to allow frozen=True in downstream/inheriting
 class Buildable:
     """
@@ -32,6 +452,23 @@ class Buildable:
     """
 
     _was_built: bool = dataclasses.field(default=False, init=False, repr=False)
+    __plan_ignore__: ClassVar[bool] = False  # trivial nodes are not worth to be planned
+    __built_by_self__: ClassVar[list[str]] = []  # fields whose Buildables are built in _build_self, not as children
+    __build_timeout__: ClassVar[Optional[float]] = None  # seconds, for the build of this node including its children
+    __build_resources__: ClassVar[dict[str, float]] = {}  # for example {"mem_gb": 30}, see: ParallelBuildConfig.resources
+    __hash_memoizable__: ClassVar[bool] = True  # see: dataclass_utils._HashEncoder
+
+    def __setattr__(self, name: str, value: Any):
+        super().__setattr__(name, value)
+        self.__dict__.pop(HASH_MEMO_KEY, None)
+
+    def __getstate__(self) -> dict:
+        """
+        hash-memo is not pickled, it would be (depth of graph) times the size of the serialized graph
+        """
+        state = dict(self.__dict__)
+        state.pop(HASH_MEMO_KEY, None)
+        return state
 
     @property
     def _is_ready(self) -> bool:
@@ -46,35 +483,220 @@ class Buildable:
         """
         should NOT be overwritten!
         """
-        if not self._is_ready:
-            all_undefined_must_be_filled(self)
-            self._build_all_children()
-            start = time()
-            o = self._build_self()
-            if o is None:
-                o = self
-            self._was_built = True
-            duration = time() - start
-            if duration > 1.0 and DEBUG:
-                print(
-                    f"build_self of {self.__class__.__name__} took:{duration} seconds"
-                )
-                # traceback.print_stack()
+        if self.__build_timeout__ is None and not _optional_build_features_are_on():
+            return self._build_plain()
+        registry = current_build_registry()
+        registry_key = self._registry_key() if registry is not None else None
+        if registry_key is not None:
+            if self._replaces_registered():
+                registry.discard(registry_key)
+            o = registry.build_once(
+                registry_key,
+                self._build_in_session,
+                self._registry_bytes,
+                while_waiting=PARALLEL_BUILD.release_slot,
+            )
         else:
-            # print(f"not building {self.__class__.__name__}, is ready!")
-            self._was_built = True  # being ready is as good as being built
-            o = self
+            o = self._build_in_session()
+        self._adopt_deduplicated(o)
+        return o
+
+    def _build_in_session(self) -> Any:
+        session = current_build_session()
+        if session is None and BUILD_DEDUP:
+            with BuildSession():
+                return self._build_in_session()
+        elif session is not None:
+            return session.build_once(
+                self,
+                self._build_session_key(),
+                self._build_node,
+                while_waiting=PARALLEL_BUILD.release_slot,
+            )
+        else:
+            return self._build_node()
+
+    def _build_node(self) -> Any:
+        with self._timeout_scope(), trace_span(self):
+            raise_if_cancelled()
+            resources = self.__build_resources__
+            with PARALLEL_BUILD.hold_slot(resources), trace_span(self, "is_ready"):
+                is_ready = self._is_ready
+            if not is_ready:
+                all_undefined_must_be_filled(self)
+                self._build_all_children()
+                raise_if_cancelled()
+                start = time()
+                with PARALLEL_BUILD.hold_slot(resources), trace_span(
+                    self, "build_self"
+                ), memory_span(self, "build_self"):
+                    o = run_maybe_async(self._build_self)
+                if o is None:
+                    o = self
+                self._was_built = True
+                duration = time() - start
+                if duration > 1.0 and DEBUG:
+                    print(
+                        f"build_self of {self.__class__.__name__} took:{duration} seconds"
+                    )
+                    # traceback.print_stack()
+            else:
+                # print(f"not building {self.__class__.__name__}, is ready!")
+                self._was_built = True  # being ready is as good as being built
+                o = self
         assert o is not None  # TODO: should be done be beartype!
         return o
 
+    def _build_plain(self) -> Any:
+        """
+        _build_node without the context-managers of the optional features, they cost more than building a trivial node
+        """
+        raise_if_cancelled()
+        if self._is_ready:
+            self._was_built = True  # being ready is as good as being built
+            return self
+        all_undefined_must_be_filled(self)
+        self._build_all_children()
+        raise_if_cancelled()
+        start = time()
+        o = run_maybe_async(self._build_self)
+        self._was_built = True
+        duration = time() - start
+        if duration > 1.0 and DEBUG:
+            print(f"build_self of {self.__class__.__name__} took:{duration} seconds")
+        return o if o is not None else self
+
+    @final
+    async def abuild(self) -> Any:
+        """
+        asyncio-version of build, for graphs whose nodes mostly wait (downloads, locks, other processes)
+        independent children are awaited concurrently, async _build_self (CachedData: async _build_cache) are awaited
+        sync implementations (also _is_ready) run in a thread, see ABUILD_MAX_THREADS
+        """
+        registry = current_build_registry()
+        registry_key = self._registry_key() if registry is not None else None
+        if registry_key is not None:
+            if self._replaces_registered():
+                registry.discard(registry_key)
+            o = await registry.abuild_once(
+                registry_key, self._abuild_in_session, self._registry_bytes
+            )
+        else:
+            o = await self._abuild_in_session()
+        self._adopt_deduplicated(o)
+        return o
+
+    def _adopt_deduplicated(self, o: Any):
+        """
+        deduplicated (BuildSession, BuildRegistry): some equal node got built instead of this one
+        this one takes over its state (shallow, no copies), so callers ignoring the return value of build still get a built node
+        """
+        if o is not self and not self._was_built and type(o) is type(self):
+            self.__dict__.update(o.__dict__)
+            self.__dict__.pop(HASH_MEMO_KEY, None)
+
+    async def _abuild_in_session(self) -> Any:
+        session = current_build_session()
+        if session is None and BUILD_DEDUP:
+            with BuildSession():
+                return await self._abuild_in_session()
+        elif session is not None:
+            return await session.abuild_once(
+                self, self._build_session_key(), self._abuild_node
+            )
+        else:
+            return await self._abuild_node()
+
+    async def _abuild_node(self) -> Any:
+        with self._timeout_scope(), trace_span(self):
+            raise_if_cancelled()
+            with trace_span(self, "is_ready"):
+                is_ready = await run_in_build_thread(lambda: self._is_ready)
+            if not is_ready:
+                all_undefined_must_be_filled(self)
+                await self._abuild_all_children()
+                raise_if_cancelled()
+                with trace_span(self, "build_self"), memory_span(self, "build_self"):
+                    o = await self._abuild_self()
+                if o is None:
+                    o = self
+            else:
+                o = self
+            self._was_built = True
+        return o
+
+    async def _abuild_self(self) -> Any:
+        if inspect.iscoroutinefunction(self._build_self):
+            return await self._build_self()
+        else:
+            return await run_in_build_thread(self._build_self)
+
+    def _timeout_scope(self):
+        if self.__build_timeout__ is None:
+            return nullcontext()
+        return cancellation_scope(self.__build_timeout__, label=node_label(self))
+
+    def _build_session_key(self) -> Optional[str]:
+        """
+        nodes with equal keys are considered equal, within a BuildSession they are built only once
+        None means: only deduplicate by identity
+        """
+        return None
+
+    def _registry_key(self) -> Optional[str]:
+        """
+        nodes with equal keys share one instance within a BuildRegistry, None means: not registered
+        """
+        return None
+
+    def _replaces_registered(self) -> bool:
+        """
+        True if an equal node in the BuildRegistry is outdated by building this one (CachedData: overwrite_cache)
+        """
+        return False
+
+    def _registry_bytes(self) -> int:
+        """
+        estimated memory-usage of the built node, see: BuildRegistry.max_bytes
+        """
+        return 0
+
+    def _children(self) -> Iterator[tuple[str, "Buildable"]]:
+        """
+        Buildables in init-fields, also the ones nested in plain lists, tuples or dicts
+        """
+        for name in _child_field_names(type(self)):
+            yield from _find_buildables(getattr(self, name), name)
+
     def _build_all_children(self):
-        for f in fields(self):
-            is_argument_of_dataclasses_init_method = f.init
-            if is_argument_of_dataclasses_init_method:
-                obj = getattr(self, f.name)
-                if isinstance(obj, Buildable):
-                    # whoho! black-magic here! the child can overwrite itself and thereby shape-shift completely!
-                    setattr(self, f.name, obj.build())
+        names, values, children = self._collect_children()
+        if len(children) > 0:
+            built = build_independent(children)
+            self._set_built_children(names, values, children, built)
+
+    async def _abuild_all_children(self):
+        names, values, children = self._collect_children()
+        if len(children) > 0:
+            built = await abuild_independent(children)
+            self._set_built_children(names, values, children, built)
+
+    def _collect_children(
+        self, names: Optional[tuple[str, ...]] = None
+    ) -> tuple[tuple[str, ...], list[Any], list["Buildable"]]:
+        names = _child_field_names(type(self)) if names is None else names
+        values = [getattr(self, name) for name in names]
+        children = [
+            obj for v, n in zip(values, names) for _, obj in _find_buildables(v, n)
+        ]
+        return names, values, children
+
+    def _set_built_children(self, names, values, children, built):
+        id2built = {id(obj): o for obj, o in zip(children, built)}
+        for name, value in zip(names, values):
+            # whoho! black-magic here! the child can overwrite itself and thereby shape-shift completely!
+            new_value = _replace_built(value, id2built)
+            if new_value is not value:
+                setattr(self, name, new_value)
 
     def _build_self(self) -> Any:
         """
@@ -83,6 +705,35 @@ class Buildable:
         """
         pass
 
+    @final
+    def plan(self, estimate_seconds: Optional[EstimateSeconds] = None) -> BuildPlan:
+        """
+        dry-run of build: which nodes are ready, would be loaded, built or would block on lock-files of other processes
+        does NOT build or load anything!
+        """
+        return plan_graph(self, estimate_seconds)
+
+    def _plan_status(self) -> str:
+        """
+        must NOT build or load anything! override this if _is_ready can be checked without side effects
+        """
+        return READY if self._was_built else BUILD
+
+    def _planned_cache_dir(self) -> Optional[str]:
+        return None
+
+    def _children_to_plan(self) -> Iterator[tuple[str, Any]]:
+        """
+        children that a build would build, key is used to describe the path in the graph
+        """
+        yield from self._children()
+
+    def _runtime_field_names(self) -> tuple[str, ...]:
+        """
+        fields whose children are needed even if this node is loaded from cache, see: CachedData.__build_time_only__
+        """
+        return ()
+
 
 T = TypeVar("T")
 
@@ -90,19 +741,45 @@ T = TypeVar("T")
 @dataclass
 class BuildableContainer(Generic[T], Buildable):
     data: T
+    __built_by_self__: ClassVar[list[str]] = ["data"]
 
     def _build_self(self):
         # print(f"triggered build for {self.__class__.__name__}")
+        keys = self._buildable_keys()
+        built = build_independent([self.data[k] for k in keys])
+        self._set_built_items(keys, built)
+
+    async def _abuild_self(self):
+        keys = self._buildable_keys()
+        built = await abuild_independent([self.data[k] for k in keys])
+        self._set_built_items(keys, built)
+
+    def _buildable_keys(self) -> list[Any]:
         if isinstance(self.data, (list, tuple)):
-            g = (x for x in self.data)
+            items = enumerate(self.data)
         elif isinstance(self.data, dict):
-            g = (v for v in self.data.values())
+            items = self.data.items()
         else:
             raise NotImplementedError
+        return [k for k, v in items if hasattr(v, "build")]
 
-        for obj in g:
-            if hasattr(obj, "build"):
-                obj.build()  # TODO: no shapeshifting here!!
+    def _set_built_items(self, keys: list[Any], built: list[Any]):
+        """
+        shape-shifted or deduplicated (see BuildSession) items replace the unbuilt ones
+        """
+        data = list(self.data) if isinstance(self.data, tuple) else self.data
+        for k, o in zip(keys, built):
+            data[k] = o
+        if data is not self.data:
+            self.data = tuple(data)
+
+    def _children_to_plan(self) -> Iterator[tuple[str, Any]]:
+        items = (
+            enumerate(self.data)
+            if isinstance(self.data, (list, tuple))
+            else self.data.items()
+        )
+        yield from ((f"{k}", v) for k, v in items if hasattr(v, "build"))
 
     def _tear_down_all_chrildren(self):
         if isinstance(self.data, (list, tuple)):
@@ -120,11 +797,22 @@ V = TypeVar("V")
 @dataclass
 class BuildableDict(Generic[K, V], Buildable):
     data: dict[K, V]
+    __built_by_self__: ClassVar[list[str]] = ["data"]
 
     def _build_self(self):
-        for k, v in self.data.items():
-            if hasattr(v, "build"):
-                self.data[k] = v.build()
+        keys = [k for k, v in self.data.items() if hasattr(v, "build")]
+        built = build_independent([self.data[k] for k in keys])
+        for k, v in zip(keys, built):
+            self.data[k] = v
+
+    async def _abuild_self(self):
+        keys = [k for k, v in self.data.items() if hasattr(v, "build")]
+        built = await abuild_independent([self.data[k] for k in keys])
+        for k, v in zip(keys, built):
+            self.data[k] = v
+
+    def _children_to_plan(self) -> Iterator[tuple[str, Any]]:
+        yield from ((f"{k}", v) for k, v in self.data.items() if hasattr(v, "build"))
 
     def __getitem__(self, key):
         return self.data[key]
@@ -151,6 +839,7 @@ class BuildableDict(Generic[K, V], Buildable):
 if DEBUG_MEMORY_LEAK:
     """
     usefull to find memory leaks when build multiple objects via BuildableList
+    for per-node numbers see: build_memory.BuildMemoryProfiler
     """
     from pympler.tracker import SummaryTracker
 
@@ -166,6 +855,7 @@ class BuildableList(Buildable, list[T]):
     # TODO: beartype does not like InitVar
     # init_only_data: dataclasses.InitVar[list]=None
     data: list[T] = dataclasses.field(init=True, repr=True)
+    __built_by_self__: ClassVar[list[str]] = ["data"]
 
     def __post_init__(self):
         self.extend(self.data)
@@ -174,6 +864,13 @@ class BuildableList(Buildable, list[T]):
         if DEBUG_MEMORY_LEAK:
             tracker.print_diff()
             print(f"triggered build for {self.__class__.__name__}")
+        if PARALLEL_BUILD.is_parallel:
+            indizes = [k for k, obj in enumerate(self) if isinstance(obj, Buildable)]
+            built = build_independent([self[k] for k in indizes])
+            for k, o in zip(indizes, built):
+                self[k] = o
+            return
+
         for k, obj in enumerate(self):
             if isinstance(obj, Buildable):
                 self[k] = obj.build()
@@ -182,5 +879,76 @@ class BuildableList(Buildable, list[T]):
                     # objgraph.show_most_common_types(limit=20)
                     # breakpoint()
 
+    def stream(
+        self,
+        consumer: Optional[Callable[[Any], Any]] = None,
+        window: int = 1,
+        collect_garbage: bool = True,
+    ) -> Iterator[Any]:
+        """
+        memory-bounded alternative to build: items are built one after another and released once consumed
+        yields built items or what the consumer returns for them
+        window: max number of built items alive, window>1 builds the next items in background threads while the current one is consumed
+
+        a (deep) copy of each item is built, so this list keeps the unbuilt "configs" and does not grow in memory
+            already built nodes (items or children) are shared, not copied, unless they support tear-down
+            unbuilt sub-graphs shared by items are copied (and built/loaded) once per item, a BuildRegistry shares them
+        released items get torn down if they support it (see BuildableWithTearDown)
+        within a BuildSession memory is NOT released, cause the session keeps every built node!
+
+        for result in models_to_evaluate.stream(consumer=lambda model: evaluate(model)):
+            ...
+        """
+        assert window >= 1, f"{window=} must be >= 1"
+        num_prefetch = window - 1
+        with ThreadPoolExecutor(max_workers=max(1, num_prefetch)) as executor:
+            prefetched = deque(
+                executor.submit(copy_context().run, self._build_item_copy, k)  # session, registry, ... of this context
+                for k in range(min(num_prefetch, len(self)))
+            )
+            for k in range(len(self)):
+                built = (
+                    prefetched.popleft().result()
+                    if len(prefetched) > 0
+                    else self._build_item_copy(k)
+                )
+                next_k = k + num_prefetch
+                if num_prefetch > 0 and next_k < len(self):
+                    prefetched.append(
+                        executor.submit(copy_context().run, self._build_item_copy, next_k)
+                    )
+
+                if consumer is not None:
+                    yield consumer(built)
+                else:
+                    yield built
+
+                if hasattr(built, "_tear_down"):
+                    built._tear_down()
+                del built
+                if collect_garbage:
+                    gc.collect()
+                if DEBUG_MEMORY_LEAK:
+                    tracker.print_diff()
+
+    def _build_item_copy(self, k: int) -> Any:
+        obj = self[k]
+        if not isinstance(obj, Buildable):
+            return obj
+        shared = [  # released items get torn down, that must not happen to nodes of the caller
+            node for node in _built_nodes(obj) if not hasattr(node, "_tear_down")
+        ]
+        memo = {id(node): node for node in shared}  # deepcopy keeps what is in its memo
+        return copy.deepcopy(obj, memo).build()
+
+    def _children_to_plan(self) -> Iterator[tuple[str, Any]]:
+        yield from ((f"{k}", o) for k, o in enumerate(self) if isinstance(o, Buildable))
+
+    async def _abuild_self(self):
+        indizes = [k for k, obj in enumerate(self) if isinstance(obj, Buildable)]
+        built = await abuild_independent([self[k] for k in indizes])
+        for k, o in zip(indizes, built):
+            self[k] = o
+
     def _tear_down_all_chrildren(self):
         self.data = [x._tear_down() for x in self.data]
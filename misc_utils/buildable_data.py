@@ -9,6 +9,7 @@ from slugify import slugify
 
 from data_io.readwrite_files import read_jsonl, write_jsonl
 from misc_utils.beartypes import NeStr
+from misc_utils.build_plan import BUILD, READY
 from misc_utils.buildable import Buildable
 from misc_utils.prefix_suffix import PrefixSuffix, BASE_PATHES
 from misc_utils.utils import slugify_with_underscores
@@ -71,6 +72,9 @@ class BuildableData(Buildable):
         #     self._load_data() # this is not really explicit!
         return is_valid
 
+    def _plan_status(self) -> str:
+        return READY if self._is_data_valid else BUILD
+
     def __enter__(self):
         """
         use to load the model into memory, prepare things
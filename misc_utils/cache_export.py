@@ -0,0 +1,212 @@
+import argparse
+import fcntl
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from data_io.readwrite_files import read_json, write_json
+from misc_utils.content_store import add_to_store, link_from_store, read_digests
+
+EXPORT_MANIFEST_FILE_NAME = "export_manifest.json"
+_FICLONE = 0x40049409  # linux ioctl: reflink (btrfs, xfs, ...)
+_TRANSIENT_SUFFIXES = (  # see: cached_data, cache_gc
+    ".lock.lock",
+    ".staging",
+    ".staging.trash",
+    ".evicted",
+    ".tmp",
+)
+
+
+@dataclass
+class ExportStats:
+    copied_files: int = 0
+    copied_bytes: int = 0
+    linked_files: int = 0  # reflinked or hardlinked
+    unchanged_files: int = 0
+
+    def __str__(self) -> str:
+        return f"copied: {self.copied_files} files ({self.copied_bytes / 1024**3:.2f} GB), linked: {self.linked_files}, unchanged: {self.unchanged_files}"
+
+
+def _walk_files(src_dir: str) -> Iterator[tuple[str, os.stat_result]]:
+    """
+    relative paths of all files, not descending into staging-dirs and the like
+    """
+    for entry in os.scandir(src_dir):
+        if entry.name.endswith(_TRANSIENT_SUFFIXES):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            for rel_path, stat in _walk_files(entry.path):
+                yield f"{entry.name}/{rel_path}", stat
+        elif entry.is_file() and entry.name != EXPORT_MANIFEST_FILE_NAME:
+            yield entry.name, entry.stat()
+
+
+def _same_file_exported(dst: str, stat: os.stat_result) -> bool:
+    """
+    copies, reflinks and hardlinks keep size and mtime of the src-file
+    """
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        return False
+    return (dst_stat.st_size, dst_stat.st_mtime_ns) == (stat.st_size, stat.st_mtime_ns)
+
+
+def _reflink(src: str, dst: str) -> bool:
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+    except OSError:
+        if os.path.isfile(dst):
+            os.remove(dst)
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+class CacheExporter:
+    """
+    incrementally copies a cache-tree, only files that are missing or changed (size or mtime) since the last export
+    what got exported is remembered in a manifest ({dst_dir}.export_manifest.json, next to the dst_dir not within the cache-tree)
+        -> exporting again only stats the src_dir, never the dst_dir, and is a cheap no-op if nothing changed
+        -> the manifest is trusted, remove it if files in the dst_dir got changed or deleted by hand
+        -> files not in the manifest, but with same size and mtime in the dst_dir (exported without/before the manifest) are not exported again
+    files are reflinked if the filesystem supports it, else hardlinked (if hardlinks=True and same filesystem), else copied
+    store_dir: content-store of the dst (see: content_store), deduplicated files are hardlinked from its blobs, missing blobs get added
+    files are copied in parallel and written to temporary files that are renamed, so a file in the dst_dir is either complete or missing
+    skips lock-files, staging-dirs of running builds and other transient stuff
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 16,
+        hardlinks: bool = False,
+        store_dir: Optional[str] = None,
+    ):
+        self.max_workers = max_workers
+        self.hardlinks = hardlinks
+        self.store_dir = store_dir
+        self._lock = threading.Lock()
+
+    def export(self, src_dir: str, dst_dir: str) -> ExportStats:
+        manifest_file = f"{dst_dir.rstrip('/')}.{EXPORT_MANIFEST_FILE_NAME}"
+        exported: dict[str, list[int]] = (
+            read_json(manifest_file) if os.path.isfile(manifest_file) else {}
+        )
+        stats = ExportStats()
+        todo = []
+        seeded = False
+        for rel_path, stat in _walk_files(src_dir):
+            if exported.get(rel_path, None) == [stat.st_size, stat.st_mtime_ns]:
+                stats.unchanged_files += 1
+            elif rel_path not in exported and _same_file_exported(
+                f"{dst_dir}/{rel_path}", stat
+            ):
+                exported[rel_path] = [stat.st_size, stat.st_mtime_ns]
+                stats.unchanged_files += 1
+                seeded = True
+            else:
+                todo.append((rel_path, stat))
+        if len(todo) == 0 and not seeded:
+            return stats
+
+        os.makedirs(dst_dir, exist_ok=True)
+        same_filesystem = os.stat(src_dir).st_dev == os.stat(dst_dir).st_dev
+        can_reflink = [True]  # do not try for every single file once it failed
+        digests = read_digests(src_dir) if self.store_dir is not None else {}
+        if len(digests) > 0:
+            os.makedirs(self.store_dir, exist_ok=True)
+
+        def export_file(rel_path: str, stat: os.stat_result):
+            src, dst = f"{src_dir}/{rel_path}", f"{dst_dir}/{rel_path}"
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            tmp_file = f"{dst}.{uuid.uuid4().hex[:8]}.tmp"
+            digest = digests.get(rel_path, None)
+            try:
+                linked = digest is not None and link_from_store(
+                    tmp_file, self.store_dir, digest
+                )
+                if not linked:
+                    linked = can_reflink[0] and _reflink(src, tmp_file)
+                if not linked:
+                    can_reflink[0] = False
+                    if self.hardlinks and same_filesystem:
+                        os.link(src, tmp_file)
+                        linked = True
+                    else:
+                        shutil.copy2(src, tmp_file)
+                os.replace(tmp_file, dst)
+            finally:
+                if os.path.isfile(tmp_file):
+                    os.remove(tmp_file)
+            if digest is not None:  # a no-op if linked from the store
+                add_to_store(dst, self.store_dir, digest)
+            with self._lock:
+                exported[rel_path] = [stat.st_size, stat.st_mtime_ns]
+                if linked:
+                    stats.linked_files += 1
+                else:
+                    stats.copied_files += 1
+                    stats.copied_bytes += stat.st_size
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(export_file, *t) for t in todo]
+                for future in futures:
+                    future.result()
+        finally:  # what got exported so far does not need to be exported again
+            tmp_manifest = f"{manifest_file}.{uuid.uuid4().hex[:8]}.tmp"
+            write_json(tmp_manifest, exported)
+            os.replace(tmp_manifest, manifest_file)
+        return stats
+
+
+def export_cache_tree(
+    src_dir: str,
+    dst_dir: str,
+    max_workers: int = 16,
+    hardlinks: bool = False,
+    store_dir: Optional[str] = None,
+) -> ExportStats:
+    return CacheExporter(max_workers, hardlinks, store_dir).export(src_dir, dst_dir)
+
+
+def main(args: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="incrementally exports (copies) a cache-tree, see: CacheExporter"
+    )
+    parser.add_argument("src_dir")
+    parser.add_argument("dst_dir")
+    parser.add_argument("--max-workers", type=int, default=16)
+    parser.add_argument(
+        "--hardlinks",
+        action="store_true",
+        help="hardlink instead of copy if on same filesystem, dst-files are then NOT independent copies",
+    )
+    parser.add_argument(
+        "--store-dir",
+        default=None,
+        help="content-store of the dst, deduplicated files are hardlinked from its blobs, see: content_store",
+    )
+    parsed = parser.parse_args(args)
+    stats = export_cache_tree(
+        parsed.src_dir,
+        parsed.dst_dir,
+        parsed.max_workers,
+        parsed.hardlinks,
+        parsed.store_dir,
+    )
+    print(f"{parsed.src_dir} -> {parsed.dst_dir}: {stats}")
+
+
+if __name__ == "__main__":
+    """
+    python -m misc_utils.cache_export /data/cache /mnt/new_machine/data/cache --max-workers 32
+    """
+    main()
@@ -0,0 +1,145 @@
+import argparse
+import os
+import shutil
+import uuid
+from dataclasses import dataclass
+from time import time
+from typing import Optional
+
+from misc_utils.cache_manifest import MANIFEST_FILE_NAME, dir_size_bytes, manifest_of
+from misc_utils.cached_data import (
+    CachedData,
+    _lock_files_exist,
+    remove_stale_staging_dirs,
+)
+from misc_utils.content_store import remove_orphaned_blobs
+from misc_utils.filelock_utils import exclusive_dir_lock
+
+GB = 1024**3
+DAY = 24 * 3600
+
+
+@dataclass
+class CacheDirInfo:
+    path: str
+    size_bytes: int
+    last_access: float  # mtime of the cache-dir, updated on every load, see: cached_data.using_cache_dir
+
+
+def cache_dirs(cache_base_dir: str) -> list[CacheDirInfo]:
+    """
+    complete cache-dirs (containing a dataclass.json) directly within the cache_base_dir
+    least recently accessed first
+    """
+    json_name = CachedData._json_file_name
+    paths = (f"{cache_base_dir}/{name}" for name in os.listdir(cache_base_dir))
+    infos = [
+        CacheDirInfo(p, dir_size_bytes(p), os.path.getmtime(p))
+        for p in paths
+        if os.path.isfile(f"{p}/{json_name}")
+    ]
+    return sorted(infos, key=lambda info: info.last_access)
+
+
+def _evict(cache_dir: str, min_idle_seconds: float) -> bool:
+    """
+    never evicts cache-dirs that are (re)built (claimed) or loaded (shared_dir_lock) on this host
+    loads on other hosts are only protected by min_idle_seconds, choose it longer than the longest load
+    the cache-dir is renamed before it gets removed, so it never is seen half-removed
+    """
+    if _lock_files_exist(cache_dir):
+        return False
+    with exclusive_dir_lock(cache_dir) as locked:
+        if not locked or time() - os.path.getmtime(cache_dir) < min_idle_seconds:
+            return False  # got loaded since it was listed
+        evicted_dir = f"{cache_dir}-{uuid.uuid4().hex[:8]}.evicted"
+        os.rename(cache_dir, evicted_dir)
+    shutil.rmtree(evicted_dir, ignore_errors=True)
+    return True
+
+
+def collect_garbage(
+    cache_base_dir: str,
+    max_bytes: Optional[int] = None,
+    max_age_seconds: Optional[float] = None,
+    min_idle_seconds: float = 3600.0,
+    dry_run: bool = False,
+) -> list[CacheDirInfo]:
+    """
+    LRU-eviction of the cache-dirs of one cache_base until it fits into max_bytes, and of all not accessed within max_age_seconds
+    min_idle_seconds: protects cache-dirs that were recently loaded, processes might still read from them after loading
+        the only protection of cache-dirs being loaded on other hosts (dir-locks are local to a host)
+    also removes stale staging-dirs of crashed builds and the manifest-entries of evicted cache-dirs
+    returns the evicted (or if dry_run would-be evicted) cache-dirs
+    """
+    infos = cache_dirs(cache_base_dir)
+    total_bytes = sum(info.size_bytes for info in infos)
+    now = time()
+    has_manifest = os.path.isfile(f"{cache_base_dir}/{MANIFEST_FILE_NAME}")
+    evicted = []
+    for info in infos:
+        idle_seconds = now - info.last_access
+        if idle_seconds < min_idle_seconds:
+            break  # all following ones are even younger
+        too_old = max_age_seconds is not None and idle_seconds > max_age_seconds
+        too_big = max_bytes is not None and total_bytes > max_bytes
+        if not (too_old or too_big):
+            continue
+        if dry_run or _evict(info.path, min_idle_seconds):
+            evicted.append(info)
+            total_bytes -= info.size_bytes
+            if has_manifest and not dry_run:
+                manifest_of(cache_base_dir).remove(os.path.basename(info.path))
+    if not dry_run:
+        remove_stale_staging_dirs(cache_base_dir, max(min_idle_seconds, DAY))
+    return evicted
+
+
+def main(args: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="evicts least recently used cache-dirs of cache_base-directories"
+    )
+    parser.add_argument("cache_base_dirs", nargs="+")
+    parser.add_argument("--max-gb", type=float, default=None, help="per cache_base")
+    parser.add_argument("--max-age-days", type=float, default=None)
+    parser.add_argument(
+        "--min-idle-hours",
+        type=float,
+        default=1.0,
+        help="protects loads on other hosts, must be longer than the longest load",
+    )
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument(
+        "--content-store",
+        default=None,
+        help="content_store-dir of the cache-root, its orphaned blobs get removed after eviction",
+    )
+    parsed = parser.parse_args(args)
+    assert (
+        parsed.max_gb is not None or parsed.max_age_days is not None
+    ), "give a budget: --max-gb and/or --max-age-days"
+
+    for cache_base_dir in parsed.cache_base_dirs:
+        evicted = collect_garbage(
+            cache_base_dir,
+            max_bytes=int(parsed.max_gb * GB) if parsed.max_gb is not None else None,
+            max_age_seconds=parsed.max_age_days * DAY
+            if parsed.max_age_days is not None
+            else None,
+            min_idle_seconds=parsed.min_idle_hours * 3600,
+            dry_run=parsed.dry_run,
+        )
+        for info in evicted:
+            print(f"{'would evict' if parsed.dry_run else 'evicted'}: {info.path}")
+        freed_gb = sum(info.size_bytes for info in evicted) / GB
+        print(f"{cache_base_dir}: {len(evicted)} cache-dirs, {freed_gb:.2f} GB")
+    if parsed.content_store is not None and not parsed.dry_run:
+        freed_gb = remove_orphaned_blobs(parsed.content_store) / GB
+        print(f"{parsed.content_store}: {freed_gb:.2f} GB of orphaned blobs")
+
+
+if __name__ == "__main__":
+    """
+    python -m misc_utils.cache_gc /data/cache/processed_data --max-gb 500 --max-age-days 30
+    """
+    main()
@@ -0,0 +1,157 @@
+import atexit
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from dataclasses import dataclass
+from time import time
+from typing import Optional
+
+from misc_utils.utils import just_try
+
+CACHE_MANIFEST = os.environ.get("CACHE_MANIFEST", "False").lower() != "false"
+MANIFEST_FILE_NAME = "manifest.sqlite"
+TOUCH_FLUSH_SECONDS = 60.0
+
+BUILDING = "building"
+CACHED = "cached"
+
+
+@dataclass
+class ManifestEntry:
+    cache_key: str  # name of the cache-dir within the cache_base
+    clazz: str
+    status: str
+    size_bytes: Optional[int]
+    created: float
+    last_access: float
+
+
+def dir_size_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, f))
+        for root, _, files in os.walk(path)
+        for f in files
+        if os.path.isfile(os.path.join(root, f))
+    )
+
+
+class CacheManifest:
+    """
+    index of the cache-dirs of one cache_base: a single indexed query instead of several stats per node (on NFS)
+    sqlite in rollback-journal-mode, one connection per query, so it can be shared by threads, processes and hosts
+        WAL-mode would need shared-memory, which is not shared across hosts (on NFS) -> corrupt manifests
+        relies on fcntl-locks being forwarded to the server (NFSv4 or NFSv3 with lockd)
+    entries of cache-dirs that got removed (overwrite_cache, cache_gc, by hand) are removed, once noticed
+    """
+
+    def __init__(self, manifest_file: str):
+        self.manifest_file = manifest_file
+        self._lock = threading.Lock()
+        self._touched: dict[str, float] = {}
+        self._last_flush = time()
+        with closing(self._connect()) as con, con:
+            con.execute("PRAGMA journal_mode=DELETE")  # also converts manifests created in WAL-mode
+            con.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    cache_key TEXT PRIMARY KEY,
+                    clazz TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    size_bytes INTEGER,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            con.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.manifest_file, timeout=60.0)
+
+    def record(
+        self,
+        cache_key: str,
+        clazz: str,
+        status: str,
+        size_bytes: Optional[int] = None,
+    ):
+        now = time()
+        with closing(self._connect()) as con, con:
+            con.execute(
+                """INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                    status=excluded.status, size_bytes=excluded.size_bytes, last_access=excluded.last_access""",
+                (cache_key, clazz, status, size_bytes, now, now),
+            )
+
+    def lookup(self, cache_key: str, touch: bool = True) -> Optional[ManifestEntry]:
+        """
+        read-only query, cache hits must not serialize on sqlite's write-lock
+        touch: updates last_access, batched: written by the next flush
+        """
+        with closing(self._connect()) as con:
+            row = con.execute(
+                "SELECT * FROM entries WHERE cache_key=?", (cache_key,)
+            ).fetchone()
+        if row is not None and touch:
+            with self._lock:
+                self._touched[cache_key] = time()
+                due = time() - self._last_flush > TOUCH_FLUSH_SECONDS
+            if due:
+                self.flush()
+        return ManifestEntry(*row) if row is not None else None
+
+    def flush(self):
+        """
+        writes the batched last_access-updates in a single transaction
+        happens at most every TOUCH_FLUSH_SECONDS, before listing entries and at process exit
+        """
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._last_flush = time()
+        if len(touched) > 0:
+            with closing(self._connect()) as con, con:
+                con.executemany(
+                    "UPDATE entries SET last_access=MAX(last_access, ?) WHERE cache_key=?",
+                    [(t, k) for k, t in touched.items()],
+                )
+
+    def remove(self, cache_key: str):
+        with closing(self._connect()) as con, con:
+            con.execute("DELETE FROM entries WHERE cache_key=?", (cache_key,))
+
+    def entries(self, status: Optional[str] = None) -> list[ManifestEntry]:
+        """
+        least recently accessed first
+        """
+        self.flush()
+        query = "SELECT * FROM entries"
+        params = ()
+        if status is not None:
+            query, params = f"{query} WHERE status=?", (status,)
+        with closing(self._connect()) as con:
+            rows = con.execute(f"{query} ORDER BY last_access", params).fetchall()
+        return [ManifestEntry(*row) for row in rows]
+
+
+_DIR2MANIFEST: dict[str, CacheManifest] = {}
+_LOCK = threading.Lock()
+
+
+def manifest_of(cache_base_dir: str) -> CacheManifest:
+    with _LOCK:
+        if cache_base_dir not in _DIR2MANIFEST:
+            os.makedirs(cache_base_dir, exist_ok=True)
+            _DIR2MANIFEST[cache_base_dir] = CacheManifest(
+                f"{cache_base_dir}/{MANIFEST_FILE_NAME}"
+            )
+    return _DIR2MANIFEST[cache_base_dir]
+
+
+def _flush_all():
+    for manifest in list(_DIR2MANIFEST.values()):
+        just_try(manifest.flush, verbose=True)  # cache_base might be gone
+
+
+atexit.register(_flush_all)
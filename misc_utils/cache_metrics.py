@@ -0,0 +1,145 @@
+import atexit
+import os
+import threading
+from bisect import bisect_left
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from data_io.readwrite_files import write_file, write_json
+
+CACHE_METRICS_FILE = os.environ.get("CACHE_METRICS_FILE", None)  # *.prom -> prometheus-textfile, otherwise json
+
+BUCKETS = (0.01, 0.1, 1.0, 10.0, 60.0, 600.0, 3600.0)  # seconds
+PROMETHEUS_PREFIX = "cached_data"
+
+
+@dataclass
+class Histogram:
+    counts: list[int] = field(default_factory=lambda: [0] * (len(BUCKETS) + 1))  # per bucket, last one is +Inf
+    sum: float = 0.0
+    count: int = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> list[int]:
+        cumulative = []
+        for c in self.counts:
+            cumulative.append(c + (cumulative[-1] if len(cumulative) > 0 else 0))
+        return cumulative
+
+
+@dataclass
+class CacheMetricsEntry:
+    clazz: str
+    cache_base: str
+    hits: int = 0  # loaded from cache
+    misses: int = 0  # not found in cache
+    builds: int = 0  # _build_cache succeeded
+    build_failures: int = 0
+    bytes_built: int = 0  # size on disk of the built cache-dirs
+    load_seconds: Histogram = field(default_factory=Histogram)
+    build_seconds: Histogram = field(default_factory=Histogram)
+    lock_wait_seconds: Histogram = field(default_factory=Histogram)
+
+
+COUNTERS = ["hits", "misses", "builds", "build_failures", "bytes_built"]
+HISTOGRAMS = ["load_seconds", "build_seconds", "lock_wait_seconds"]
+
+
+def _labels(node: Any) -> tuple[str, str]:
+    """
+    cache_base by its suffix, that is independent of the machine
+    """
+    cache_base = getattr(node, "cache_base", None)
+    return type(node).__name__, str(getattr(cache_base, "suffix", ""))
+
+
+def _escape(label_value: str) -> str:
+    return (
+        label_value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    )
+
+
+class CacheMetrics:
+    """
+    in-process counters and histograms of CachedData per class and cache_base
+    cache_metrics().snapshot() or cache_metrics().to_prometheus()
+    env-var CACHE_METRICS_FILE=cache_metrics.prom (or *.json) writes a snapshot at process exit
+    bytes_built (walks the entire cache-dir) is only measured if a snapshot gets written or measure_sizes is set
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[tuple[str, str], CacheMetricsEntry] = {}
+        self.measure_sizes = CACHE_METRICS_FILE is not None
+
+    def _entry(self, node: Any) -> CacheMetricsEntry:
+        labels = _labels(node)
+        if labels not in self._entries:
+            self._entries[labels] = CacheMetricsEntry(*labels)
+        return self._entries[labels]
+
+    def count(self, node: Any, counter: str, value: int = 1):
+        with self._lock:
+            entry = self._entry(node)
+            setattr(entry, counter, getattr(entry, counter) + value)
+
+    def observe(self, node: Any, histogram: str, seconds: float):
+        with self._lock:
+            getattr(self._entry(node), histogram).observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            return [asdict(e) for e in self._entries.values()]
+
+    def to_prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for counter in COUNTERS:
+            name = f"{PROMETHEUS_PREFIX}_{counter}_total"
+            lines.append(f"# TYPE {name} counter")
+            for e in snapshot:
+                labels = f'clazz="{_escape(e["clazz"])}",cache_base="{_escape(e["cache_base"])}"'
+                lines.append(f"{name}{{{labels}}} {e[counter]}")
+        for histogram in HISTOGRAMS:
+            name = f"{PROMETHEUS_PREFIX}_{histogram}"
+            lines.append(f"# TYPE {name} histogram")
+            for e in snapshot:
+                labels = f'clazz="{_escape(e["clazz"])}",cache_base="{_escape(e["cache_base"])}"'
+                h = Histogram(**e[histogram])
+                les = [f"{b}" for b in BUCKETS] + ["+Inf"]
+                for le, c in zip(les, h.cumulative_counts()):
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {c}')
+                lines.append(f"{name}_sum{{{labels}}} {h.sum}")
+                lines.append(f"{name}_count{{{labels}}} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, file: str):
+        """
+        written to a temporary file that is renamed, cause prometheus' node-exporter might read it any time
+        """
+        os.makedirs(os.path.dirname(file) or ".", exist_ok=True)
+        tmp_file = f"{file}.{os.getpid()}.tmp"
+        if file.endswith(".prom"):
+            write_file(tmp_file, self.to_prometheus())
+        else:
+            write_json(tmp_file, {"cache_metrics": self.snapshot()})
+        os.replace(tmp_file, file)
+
+
+_CACHE_METRICS = CacheMetrics()
+
+
+def cache_metrics() -> CacheMetrics:
+    return _CACHE_METRICS
+
+
+if CACHE_METRICS_FILE is not None:
+    atexit.register(lambda: _CACHE_METRICS.write(CACHE_METRICS_FILE))
@@ -0,0 +1,191 @@
+import os
+import queue
+import shutil
+import threading
+import uuid
+from time import time
+from typing import Optional
+
+from data_io.readwrite_files import read_json, write_json
+from misc_utils.cache_manifest import dir_size_bytes
+from misc_utils.filelock_utils import exclusive_dir_lock
+from misc_utils.prefix_suffix import BASE_PATHES, PrefixSuffix
+from misc_utils.utils import just_try
+
+LOCAL_CACHE_TIER = os.environ.get("LOCAL_CACHE_TIER", None)  # for example a local SSD: /scratch/cache
+LOCAL_CACHE_TIER_GB = float(os.environ.get("LOCAL_CACHE_TIER_GB", 100))
+LOCAL_TIER_KEY = "local_tier"  # in BASE_PATHES, registered once by the LocalTier
+LOCAL_TIER_MIN_IDLE_SECONDS = 3600.0  # local copies that were loaded recently might still be read from
+
+GB = 1024**3
+_JSON_FILE_NAME = "dataclass.json"  # see: CachedData._json_file_name
+_ORIGIN_FILE_NAME = "local_tier_origin.json"  # identity of the shared dataclass.json a local copy was made of
+
+
+def local_cache_dir(cache_dir: PrefixSuffix) -> Optional[PrefixSuffix]:
+    """
+    where the local tier keeps its copy of a cache-dir of the shared tier, None if there is no local tier
+    """
+    if local_tier() is None or cache_dir.prefix_key == LOCAL_TIER_KEY:
+        return None
+    return PrefixSuffix(
+        prefix_key=LOCAL_TIER_KEY, suffix=f"{cache_dir.prefix_key}/{cache_dir.suffix}"
+    )
+
+
+def _origin_of(shared_dir: str) -> Optional[list[int]]:
+    """
+    a rebuilt (overwrite_cache, maybe by another host) cache-dir gets a new dataclass.json (new inode and mtime)
+    """
+    try:
+        stat = os.stat(f"{shared_dir}/{_JSON_FILE_NAME}")
+    except FileNotFoundError:
+        return None
+    return [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+
+
+def local_copy(cache_dir: PrefixSuffix) -> Optional[PrefixSuffix]:
+    """
+    the local copy if there is a complete one (copies are renamed into place once complete)
+    and it still is a copy of the cache-dir: a single stat on the shared tier, stale copies get removed
+    """
+    local_dir = local_cache_dir(cache_dir)
+    if local_dir is None or not os.path.isfile(f"{local_dir}/{_JSON_FILE_NAME}"):
+        return None
+    origin = just_try(lambda: read_json(f"{local_dir}/{_ORIGIN_FILE_NAME}"), default=None)
+    if origin is None or origin != _origin_of(str(cache_dir)):
+        with exclusive_dir_lock(str(local_dir)) as locked:  # loaders hold a shared_dir_lock
+            if locked:
+                _remove_dir(str(local_dir))
+        return None
+    return local_dir
+
+
+def remove_local_copy(cache_dir: PrefixSuffix):
+    """
+    when the cache-dir gets overwritten, only the local copy of this host! the ones of other hosts stay (stale)
+    """
+    local_dir = local_cache_dir(cache_dir)
+    if local_dir is not None and os.path.isdir(str(local_dir)):
+        _remove_dir(str(local_dir))
+
+
+def _remove_dir(path: str):
+    """
+    renamed before it gets removed, so it never is seen half-removed
+    """
+    evicted_dir = f"{path}-{uuid.uuid4().hex[:8]}.evicted"
+    try:
+        os.rename(path, evicted_dir)
+    except FileNotFoundError:  # someone else was faster
+        return
+    shutil.rmtree(evicted_dir, ignore_errors=True)
+
+
+class LocalTier:
+    """
+    copies cache-dirs from the shared tier (NFS) to the local tier (SSD) in a background thread
+    local copies are evicted least recently used first once the local tier exceeds max_bytes
+    copies are never written to, the shared tier stays the source of truth (builds write there, with the usual locking)
+    """
+
+    def __init__(self, local_root: str, max_bytes: int):
+        self.local_root = local_root
+        BASE_PATHES[LOCAL_TIER_KEY] = local_root
+        self.max_bytes = max_bytes
+        self._queue: queue.Queue[Optional[tuple[str, str]]] = queue.Queue()  # None stops the worker
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    def promote_in_background(self, shared_dir: str, local_dir: str):
+        with self._lock:
+            if local_dir in self._pending:
+                return
+            self._pending.add(local_dir)
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._work, name="local_cache_tier", daemon=True
+                )  # daemon: interrupted copies only leave a staging-dir behind
+                self._worker.start()
+        self._queue.put((shared_dir, local_dir))
+
+    def stop(self):
+        """
+        lets the worker finish the copies queued so far and joins it, a later promote_in_background starts a new one
+        """
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(None)
+            worker.join()
+
+    def _work(self):
+        while (item := self._queue.get()) is not None:
+            shared_dir, local_dir = item
+            just_try(
+                lambda: self.promote(shared_dir, local_dir),
+                verbose=True,
+                fail_print_message_supplier=lambda: f"could not copy {shared_dir} to local tier",
+            )
+            with self._lock:
+                self._pending.discard(local_dir)
+
+    def promote(self, shared_dir: str, local_dir: str):
+        if os.path.isdir(local_dir):
+            return
+        origin = _origin_of(shared_dir)  # before copying, a copy of an overwritten cache-dir is considered stale
+        if origin is None:
+            return  # not (anymore) cached
+        os.makedirs(os.path.dirname(local_dir), exist_ok=True)
+        staging_dir = f"{local_dir}-{uuid.uuid4().hex[:8]}.staging"
+        try:
+            shutil.copytree(shared_dir, staging_dir)
+            write_json(f"{staging_dir}/{_ORIGIN_FILE_NAME}", origin)
+            os.rename(staging_dir, local_dir)
+        except OSError:
+            if not os.path.isdir(local_dir):  # otherwise: another process on this machine was faster
+                raise
+        finally:  # failed copies (disk full, shared cache-dir evicted meanwhile) leave nothing behind
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        self.enforce_budget()
+
+    def local_copies(self) -> list[tuple[str, int, float]]:
+        """
+        (path, size_bytes, last_access) of the complete local copies, least recently accessed first
+        """
+        copies = []
+        for root, dirs, files in os.walk(self.local_root):
+            dirs[:] = [d for d in dirs if not d.endswith((".staging", ".evicted"))]
+            if _JSON_FILE_NAME in files:
+                copies.append((root, dir_size_bytes(root), os.path.getmtime(root)))
+                dirs.clear()
+        return sorted(copies, key=lambda c: c[2])
+
+    def enforce_budget(self, min_idle_seconds: float = LOCAL_TIER_MIN_IDLE_SECONDS):
+        copies = self.local_copies()
+        total_bytes = sum(size for _, size, _ in copies)
+        now = time()
+        for path, size, last_access in copies:
+            if total_bytes <= self.max_bytes or now - last_access < min_idle_seconds:
+                break
+            with exclusive_dir_lock(path) as locked:  # loaders hold a shared_dir_lock
+                if not locked:
+                    continue
+                _remove_dir(path)
+            total_bytes -= size
+
+
+_LOCAL_TIER: Optional[LocalTier] = None
+_LOCK = threading.Lock()
+
+
+def local_tier() -> Optional[LocalTier]:
+    """
+    env-var LOCAL_CACHE_TIER=/scratch/cache (and LOCAL_CACHE_TIER_GB) enables the local tier
+    """
+    global _LOCAL_TIER
+    with _LOCK:
+        if LOCAL_CACHE_TIER is not None and _LOCAL_TIER is None:
+            _LOCAL_TIER = LocalTier(LOCAL_CACHE_TIER, int(LOCAL_CACHE_TIER_GB * GB))
+    return _LOCAL_TIER
@@ -1,31 +1,74 @@
 import dataclasses
+import errno
+import json
 import multiprocessing
 import os
 import shutil
+import uuid
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import ClassVar, Union
+from typing import Any, ClassVar, Iterator, Optional, Union
 
 import sys
 from beartype import beartype
-from time import time, sleep
+from time import time
 
 from data_io.readwrite_files import (
     write_json,
     read_file,
 )
-from misc_utils.buildable import Buildable
+from misc_utils.async_building import run_maybe_async
+from misc_utils.buildable import Buildable, _child_field_names, build_independent
+from misc_utils.build_cancellation import sleep_cancellable
+from misc_utils.cache_manifest import (
+    BUILDING,
+    CACHE_MANIFEST,
+    CACHED,
+    CacheManifest,
+    dir_size_bytes,
+    manifest_of,
+)
+from misc_utils.build_durations import record_duration
+from misc_utils.cache_export import export_cache_tree
+from misc_utils.cache_metrics import cache_metrics
+from misc_utils.cache_tiers import (
+    local_cache_dir,
+    local_copy,
+    local_tier,
+    remove_local_copy,
+)
+from misc_utils.content_store import (
+    CONTENT_STORE,
+    CONTENT_STORE_DIR_NAME,
+    content_store_dir,
+    deduplicate_dir,
+)
+from misc_utils.build_memory import memory_span
+from misc_utils.build_plan import BLOCKED, BUILD, LOAD, READY
+from misc_utils.build_tracing import trace_span
 from misc_utils.dataclass_utils import (
     deserialize_dataclass,
+    deserialize_dataclass_fields,
     encode_dataclass,
     all_undefined_must_be_filled,
     hash_dataclass,
     remove_if_exists,
     serialize_dataclass,
+    instantiate_via_importlib,
+    CLASS_REF_KEY,
 )
 from misc_utils.prefix_suffix import PrefixSuffix, BASE_PATHES
 from misc_utils.utils import Singleton, just_try
-from misc_utils.filelock_utils import claim_write_access
+from misc_utils.filelock_utils import (
+    CLAIM_STALE_SECONDS,
+    break_stale_claim,
+    claim_heartbeat,
+    claim_write_access,
+    shared_dir_lock,
+    wait_until_removed,
+)
 
 
 @dataclass
@@ -51,6 +94,94 @@ def remove_make_dir(dirr):
     )  # TODO: WTF! this sometimes failes cause it does not get that directory was removed! some state is not flushed
 
 
+def _build_cache_in_subprocess(node: "CachedData", base_pathes: dict) -> None:
+    """
+    runs in a fresh (spawned) process, hands back nothing but the cache-dir and its dataclass.json
+    """
+    BASE_PATHES.update(base_pathes)
+    run_maybe_async(node._build_cache)
+    write_json(node.dataclass_json, encode_dataclass(node), do_flush=True)
+
+
+def _claim_file(cache_dir: str) -> str:
+    """
+    next to (not inside) the cache-dir, cause the claimer (re)creates the cache-dir
+    """
+    return f"{cache_dir}.lock.lock"
+
+
+def _lock_files_exist(path: str) -> bool:
+    return os.path.isfile(_claim_file(path))
+
+
+@contextmanager
+def using_cache_dir(cache_dir: str) -> Iterator[bool]:
+    """
+    records the last access of the cache-dir and protects it from being evicted (by cache_gc on this host) while loading
+    yields False if it got evicted meanwhile
+    read-only or foreign-owned caches are loaded without recording the access
+    """
+    with shared_dir_lock(cache_dir) as exists:
+        if exists:
+            _record_access(cache_dir)
+        yield exists
+
+
+def _record_access(cache_dir: str):
+    """
+    mtime of the cache-dir is its last access, see: cache_gc
+    """
+    try:
+        os.utime(cache_dir)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        if e.errno not in (errno.EACCES, errno.EPERM, errno.EROFS):
+            raise
+
+
+STAGING_SUFFIX = ".staging"
+READ_DIR_KEY = "_read_dir"  # in __dict__, not a field: never serialized, never pickled
+
+
+def _staging_cache_dir(cache_dir: PrefixSuffix) -> PrefixSuffix:
+    """
+    sibling of the cache-dir (same filesystem -> rename is atomic), unique cause crashed builds leave theirs behind
+    """
+    return PrefixSuffix(
+        prefix_key=cache_dir.prefix_key,
+        suffix=f"{cache_dir.suffix}-{uuid.uuid4().hex[:8]}{STAGING_SUFFIX}",
+    )
+
+
+def _move_into_place(staging_dir: str, cache_dir: str):
+    """
+    a cache-dir is either complete or does not exist
+    an existing (incomplete, it has no dataclass.json, otherwise the claim would have failed) cache-dir is moved aside first
+    """
+    if os.path.isdir(cache_dir):
+        trash_dir = f"{staging_dir}.trash"
+        os.rename(cache_dir, trash_dir)
+        os.rename(staging_dir, cache_dir)
+        shutil.rmtree(trash_dir, ignore_errors=True)
+    else:
+        os.rename(staging_dir, cache_dir)
+
+
+def remove_stale_staging_dirs(cache_base_dir: str, min_age_seconds: float = 24 * 3600):
+    """
+    staging-dirs of crashed builds (or of failed builds with clean_on_fail=False)
+    younger ones might still be in use!
+    """
+    for name in os.listdir(cache_base_dir):
+        path = f"{cache_base_dir}/{name}"
+        is_staging = name.endswith(STAGING_SUFFIX) or name.endswith(
+            f"{STAGING_SUFFIX}.trash"
+        )
+        if is_staging and time() - os.path.getmtime(path) > min_age_seconds:
+            shutil.rmtree(path, ignore_errors=True)
+
+
 export_black_list = [
     "LM_DATA",
     "RAW_DATA",
@@ -68,6 +199,20 @@ class CachedData(Buildable, ABC):
     use this for short-lived "cache" only!
     for long-lived data better simply use Buildable + is_ready for checking validity of data
     long-lived data: you don't want/need different versions, use_hash_suffix=False!
+
+    __build_time_only__: fields only needed to build the cache, on a cache hit these are neither deserialized, loaded nor set up
+        all other Buildable children are "runtime"-dependencies, they get built (loaded) before _post_build_setup
+    __build_in_subprocess__ (per class) or build_in_subprocess (per node): _build_cache runs in a fresh process
+        for _build_cache implementations that leak memory or fragment the heap, this process then loads the cache like any other
+        the node (with its built children) gets pickled to the subprocess
+    __build_in_place__: by default _build_cache writes into a staging-dir (self.cache_dir points to it during _build_cache)
+        that gets renamed to the cache-dir once dataclass.json is written, so a cache-dir is complete if it exists
+        set it for classes that store paths within their cache-dir in state-fields, those would point to the staging-dir
+    env-var CONTENT_STORE=True: large files of built caches get replaced by read-only hardlinks to blobs, see: content_store
+    hits, misses, builds, load-/build-/lock-wait-seconds are counted per class and cache_base, see: cache_metrics
+    env-var LOCAL_CACHE_TIER=/scratch/cache: loaded from a local copy if there is one, otherwise from the shared tier
+        and copied to the local tier in the background, see: cache_tiers, __local_tier__=False for classes that write into loaded caches
+        cache_dir always stays the one of the shared tier, only prefix_cache_dir points to the local copy
     """
 
     # str for backward compatibility
@@ -81,7 +226,12 @@ class CachedData(Buildable, ABC):
     overwrite_cache: bool = dataclasses.field(init=True, repr=False, default=False)
     _json_file_name: ClassVar[int] = "dataclass.json"
     __exclude_from_hash__: ClassVar[list[str]] = []
+    __build_time_only__: ClassVar[list[str]] = []
+    __build_in_subprocess__: ClassVar[bool] = False
+    __build_in_place__: ClassVar[bool] = False
+    __local_tier__: ClassVar[bool] = True
     clean_on_fail: bool = dataclasses.field(default=True, repr=False)
+    build_in_subprocess: Optional[bool] = dataclasses.field(default=None, repr=False)
 
     @property
     def dataclass_json(self):
@@ -121,7 +271,7 @@ class CachedData(Buildable, ABC):
         """
         looks somehow ugly, but necessary in order to prevent build of dependencies when actually already cached
         if is_ready is True does prevent complete build: not building cache not even loading caches (of nodes further up in the graph)!!
-        # TODO: could enforce here that all runtime-dependencies are ready, concepts of build-time vs. runtime not yet implemented!!!
+        runtime-dependencies (if __build_time_only__ is declared) are built after loading from cache
         """
         is_ready = self._was_built
         if not is_ready:
@@ -142,15 +292,19 @@ class CachedData(Buildable, ABC):
         new_cache_dir = f"{new_cache_root}/{self.cache_dir.suffix}"
         if (
             new_cache_root is not None
-            and not os.path.isdir(new_cache_dir)
             and not self.cache_base_is_blacklisted(export_black_list)
             and not self.__class__.__name__ in export_black_list_class_names
         ):
-            shutil.copytree(
+            # incremental, a no-op if exported before
+            stats = export_cache_tree(
                 str(self.cache_dir),
                 new_cache_dir,
+                store_dir=(
+                    f"{new_cache_root}/{CONTENT_STORE_DIR_NAME}" if CONTENT_STORE else None
+                ),
             )
-            print(f"copied {str(self.cache_dir)} to {new_cache_root}")
+            if stats.copied_files + stats.linked_files > 0:
+                print(f"exported {str(self.cache_dir)} to {new_cache_root}: {stats}")
 
     def cache_base_is_blacklisted(self, black_list):
         return any(
@@ -160,25 +314,81 @@ class CachedData(Buildable, ABC):
             )
         )
 
+    def _build_session_key(self) -> Optional[str]:
+        location = (
+            self.cache_base
+            if self.cache_dir is CREATE_CACHE_DIR_IN_BASE_DIR
+            else self.cache_dir
+        )
+        return f"{location}/{type(self).__name__}-{hash_dataclass(self)}"
+
+    def _registry_key(self) -> Optional[str]:
+        return self._build_session_key()
+
+    def _replaces_registered(self) -> bool:
+        return self.overwrite_cache
+
+    def _registry_bytes(self) -> int:
+        """
+        size of the cache-dir, override this if the loaded data is much larger/smaller than its files
+        """
+        return dir_size_bytes(str(self.cache_dir))
+
     def _found_and_loaded_from_cache(self):
 
-        found_json = self._found_cached_data()
+        with trace_span(self, "cache_check"):
+            found_json = self._found_cached_data()
         if self.overwrite_cache:
             remove_if_exists(str(self.cache_dir))
+            remove_local_copy(self.cache_dir)
+            manifest = self._manifest()
+            if manifest is not None:
+                manifest.remove(self._manifest_key)
             successfully_loaded_cached = False
         elif found_json:
-            self._load_cached_data()
-            self._post_build_setup()
-            self._maybe_export_cache()
-            # print(
-            #     f"LOADED cached: {self.name} ({self.__class__.__name__}) from {self.cache_dir}"
-            # )
-            successfully_loaded_cached = True
+            read_dir = self._local_copy()
+            if read_dir is None:
+                read_dir = self.cache_dir
+                self._maybe_promote_to_local_tier()
+            else:  # otherwise cache_gc considers it cold
+                _record_access(str(self.cache_dir))
+            with using_cache_dir(str(read_dir)) as not_evicted:
+                if not_evicted:
+                    self._load_from_cache(read_dir)
+            successfully_loaded_cached = not_evicted
+            if not not_evicted:
+                self.__dict__.pop(READ_DIR_KEY, None)
         else:
             successfully_loaded_cached = False
 
+        cache_metrics().count(self, "hits" if successfully_loaded_cached else "misses")
         return successfully_loaded_cached
 
+    def _load_from_cache(self, read_dir: PrefixSuffix):
+        """
+        read_dir: the cache-dir or its copy in the local tier, files are read from there (see: prefix_cache_dir)
+        """
+        start = time()
+        if str(read_dir) != str(self.cache_dir):
+            self.__dict__[READ_DIR_KEY] = read_dir
+        with trace_span(self, "load_cached_data"), memory_span(
+            self, "load_cached_data"
+        ):
+            self._load_cached_data()
+        with trace_span(self, "build_runtime_children"):
+            self._build_runtime_children()
+        with trace_span(self, "post_build_setup"), memory_span(
+            self, "post_build_setup"
+        ):
+            self._post_build_setup()
+        record_duration(self, LOAD, time() - start)
+        cache_metrics().observe(self, "load_seconds", time() - start)
+        with trace_span(self, "export_cache"):
+            self._maybe_export_cache()
+        # print(
+        #     f"LOADED cached: {self.name} ({self.__class__.__name__}) from {self.cache_dir}"
+        # )
+
     @property
     @abstractmethod
     def name(self):
@@ -189,10 +399,22 @@ class CachedData(Buildable, ABC):
         raise NotImplementedError
 
     def prefix_cache_dir(self, path: str) -> str:
+        """
+        within the local copy if loaded from the local tier
+        """
         assert isinstance(
             self.cache_dir, PrefixSuffix
         ), f"{self} has invalid cache_dir: {self.cache_dir}"
-        return f"{self.cache_dir}/{path}"
+        read_dir = self.__dict__.get(READ_DIR_KEY, None)
+        return f"{read_dir if read_dir is not None else self.cache_dir}/{path}"
+
+    def __getstate__(self) -> dict:
+        """
+        the local copy is local to this host
+        """
+        state = super().__getstate__()
+        state.pop(READ_DIR_KEY, None)
+        return state
 
     @abstractmethod
     def _build_cache(self):
@@ -202,13 +424,17 @@ class CachedData(Buildable, ABC):
         self.maybe_build_cache()
 
         start = time()
-        self._post_build_setup()
+        with trace_span(self, "post_build_setup"), memory_span(
+            self, "post_build_setup"
+        ):
+            self._post_build_setup()
         duration = time() - start
         if duration >= 1.0:
             print(
                 f"SETUP: {self.name} ({self.__class__.__name__}) took: {duration} seconds from {self.cache_dir}"
             )
-        self._maybe_export_cache()
+        with trace_span(self, "export_cache"):
+            self._maybe_export_cache()
 
     def _prepare(self, cache_dir: str) -> None:
         pass
@@ -217,24 +443,91 @@ class CachedData(Buildable, ABC):
         """
         if there are lock-files this indicates that some other process/worker claimed right to write to cache
         """
-        return os.path.isfile(f"{self.cache_dir}.lock") or os.path.isfile(
-            f"{self.cache_dir}.lock.lock"
-        )
+        return _lock_files_exist(str(self.cache_dir))
+
+    def _plan_status(self) -> str:
+        if self._was_built:
+            return READY
+        if self.overwrite_cache:
+            return BUILD
+        cache_dir = self._planned_cache_dir()
+        manifest = self._manifest()
+        if manifest is not None:
+            entry = manifest.lookup(os.path.basename(cache_dir), touch=False)
+            if entry is not None and entry.status == CACHED and os.path.isdir(cache_dir):
+                return LOAD
+        dataclass_json = f"{cache_dir}/{self._json_file_name}"
+        if not self.__build_in_place__ and os.path.isfile(dataclass_json):
+            return LOAD  # complete cause staged, no need to look for lock-files
+        if _lock_files_exist(cache_dir):
+            return BLOCKED
+        elif os.path.isfile(dataclass_json):
+            return LOAD
+        else:
+            return BUILD
+
+    def _planned_cache_dir(self) -> Optional[str]:
+        """
+        does not set self.cache_dir, planning should not have side effects
+        """
+        if self.cache_dir is CREATE_CACHE_DIR_IN_BASE_DIR:
+            return str(self.create_cache_dir_from_hashed_self())
+        return str(self.cache_dir)
 
     def _found_cached_data(self) -> bool:
         if self.cache_dir is CREATE_CACHE_DIR_IN_BASE_DIR:
             self.cache_dir = self.create_cache_dir_from_hashed_self()
-        self._wait_until_cache_is_ready()
-        return self._check_cached_data()
+        if self._local_copy() is not None:
+            return True  # no stats on the shared tier needed
+        manifest = self._manifest()
+        if manifest is not None:
+            entry = manifest.lookup(self._manifest_key)
+            if entry is not None and entry.status == CACHED:
+                if os.path.isdir(str(self.cache_dir)):
+                    return True  # a single stat instead of looking for lock-files and dataclass.json
+                manifest.remove(self._manifest_key)  # got removed by hand
+        found = not self.__build_in_place__ and self._check_cached_data()
+        if not found:  # staged cache-dirs are complete if they exist, so only the misses need to look for lock-files
+            with trace_span(self, "lock_wait"):
+                self._wait_until_cache_is_ready()
+            found = self._check_cached_data()
+        if found and manifest is not None:  # built before there was a manifest
+            manifest.record(self._manifest_key, type(self).__name__, CACHED)
+        return found
+
+    def _local_copy(self) -> Optional[PrefixSuffix]:
+        if not self.__local_tier__:
+            return None
+        return local_copy(self.cache_dir)
+
+    def _maybe_promote_to_local_tier(self):
+        tier = local_tier()
+        if self.__local_tier__ and tier is not None:
+            local_dir = local_cache_dir(self.cache_dir)
+            tier.promote_in_background(str(self.cache_dir), str(local_dir))
+
+    def _manifest(self) -> Optional[CacheManifest]:
+        """
+        env-var CACHE_MANIFEST=True: one manifest per cache_base, see: cache_manifest.CacheManifest
+        """
+        if not CACHE_MANIFEST or not isinstance(self.cache_base, PrefixSuffix):
+            return None
+        return manifest_of(str(self.cache_base))
+
+    @property
+    def _manifest_key(self) -> str:
+        return os.path.basename(str(self.cache_dir))
 
     def _wait_until_cache_is_ready(self):
         wait_message = f"{self.__class__.__name__}-{self.name}-{multiprocessing.current_process().name}-is waiting\n"
-        while self._someone_else_is_writing_to_cache():
+        if self._someone_else_is_writing_to_cache():
             print(wait_message)
-            # sys.stdout.write(wait_message)
-            # sys.stdout.flush()
-            # wait_message = "."
-            sleep(1)
+            start = time()
+            claim_file = _claim_file(str(self.cache_dir))
+            while not wait_until_removed(claim_file, timeout=CLAIM_STALE_SECONDS / 10):
+                if break_stale_claim(claim_file):
+                    break  # its owner crashed, it is up to us to build it
+            cache_metrics().observe(self, "lock_wait_seconds", time() - start)
 
     def _check_cached_data(self) -> bool:
         """
@@ -248,7 +541,10 @@ class CachedData(Buildable, ABC):
         if self.cache_dir is CREATE_CACHE_DIR_IN_BASE_DIR:
             self.cache_dir = self.create_cache_dir_from_hashed_self()
 
-        should_build_cache = claim_write_access(self.dataclass_json)
+        with trace_span(self, "claim_lock"):
+            should_build_cache = claim_write_access(
+                self.dataclass_json, claim_file=_claim_file(str(self.cache_dir))
+            )
         if os.environ.get("NO_BUILD", "False").lower() != "false":
             assert (
                 not should_build_cache
@@ -263,6 +559,23 @@ class CachedData(Buildable, ABC):
         """
         pass
 
+    def _runtime_field_names(self) -> tuple[str, ...]:
+        if len(self.__build_time_only__) == 0:
+            return ()  # no distinction declared -> children are not built when loaded from cache
+        return tuple(
+            n
+            for n in _child_field_names(type(self))
+            if n not in self.__build_time_only__
+        )
+
+    def _build_runtime_children(self):
+        names = self._runtime_field_names()
+        if len(names) > 0:
+            names, values, children = self._collect_children(names)
+            if len(children) > 0:
+                built = build_independent(children)
+                self._set_built_children(names, values, children, built)
+
     def _load_cached_data(self):
         """
         TODO: am I sure that I want this as default for "everyone"?
@@ -281,53 +594,115 @@ class CachedData(Buildable, ABC):
     ) -> None:
 
         if self._claimed_right_to_build_cache():
-            cadi = str(self.cache_dir)
-            remove_make_dir(cadi)
             error = None
-            try:
-                # start = time()
-                # sys.stdout.write(
-                #     f"building CACHE {self.name} ({self.__class__.__name__}) by {multiprocessing.current_process().name}"
-                # )
-                self._build_cache()
-                # sys.stdout.write(
-                #     f"{self.name} took: {time()-start} secs; in cache-dir: {cadi} \n"
-                # )
-                # sys.stdout.flush()
-
-                write_json(self.dataclass_json, encode_dataclass(self), do_flush=True)
-                # sleep(1) # TODO:  WTF! sleep here seems to alleviate problem with multiprocessing
-            except Exception as e:
-                error = e
-                if self.clean_on_fail:
-                    shutil.rmtree(cadi, ignore_errors=True)
-            finally:
-                remove_if_exists(f"{self.dataclass_json}.lock")
-                remove_if_exists(f"{self.dataclass_json}.lock.lock")
-                if error is not None:
-                    raise error
+            manifest = self._manifest()
+            if manifest is not None:
+                manifest.record(self._manifest_key, type(self).__name__, BUILDING)
+            cadi = str(self.cache_dir)
+            cache_dir = self.cache_dir
+            if not self.__build_in_place__:
+                self.cache_dir = _staging_cache_dir(cache_dir)
+            build_dir = str(self.cache_dir)
+            with claim_heartbeat(_claim_file(cadi)):  # keeps the claim from becoming stale
+                try:
+                    remove_make_dir(build_dir)
+                    # start = time()
+                    # sys.stdout.write(
+                    #     f"building CACHE {self.name} ({self.__class__.__name__}) by {multiprocessing.current_process().name}"
+                    # )
+                    start = time()
+                    with trace_span(self, "build_cache"):
+                        if self._builds_in_subprocess:
+                            self._build_cache_in_subprocess()
+                        else:
+                            run_maybe_async(self._build_cache)  # _build_cache can be async
+                    record_duration(self, BUILD, time() - start)
+                    cache_metrics().observe(self, "build_seconds", time() - start)
+                    # sys.stdout.write(
+                    #     f"{self.name} took: {time()-start} secs; in cache-dir: {cadi} \n"
+                    # )
+                    # sys.stdout.flush()
+
+                    if self._builds_in_subprocess:
+                        # the built children in this process are as good as the ones in dataclass.json
+                        children = list({k.split(".")[0] for k, _ in self._children()})
+                        self._load_state_fields_except(
+                            read_file(self.dataclass_json),
+                            skip_keys=children + ["cache_dir"],
+                        )
+                    self.cache_dir = cache_dir
+                    if CONTENT_STORE:
+                        deduplicate_dir(build_dir, content_store_dir(cache_dir))
+                    write_json(
+                        f"{build_dir}/{self._json_file_name}",
+                        encode_dataclass(self),
+                        do_flush=True,
+                    )
+                    if build_dir != cadi:
+                        _move_into_place(build_dir, cadi)
+                    # sleep(1) # TODO:  WTF! sleep here seems to alleviate problem with multiprocessing
+                    size_bytes = (
+                        dir_size_bytes(cadi)
+                        if manifest is not None or cache_metrics().measure_sizes
+                        else None
+                    )
+                    cache_metrics().count(self, "builds")
+                    if size_bytes is not None:
+                        cache_metrics().count(self, "bytes_built", size_bytes)
+                    if manifest is not None:
+                        manifest.record(
+                            self._manifest_key, type(self).__name__, CACHED, size_bytes
+                        )
+                except Exception as e:
+                    error = e
+                    cache_metrics().count(self, "build_failures")
+                    self.cache_dir = cache_dir
+                    if self.clean_on_fail:
+                        shutil.rmtree(build_dir, ignore_errors=True)
+                    if manifest is not None:
+                        manifest.remove(self._manifest_key)
+                finally:
+                    remove_if_exists(_claim_file(cadi))  # releases the claim, wakes up waiters
+                    if error is not None:
+                        raise error
         else:
-            remove_if_exists(
-                f"{self.dataclass_json}.lock"
-            )  # failed attempt to claim lock may still create lock-file!
-            remove_if_exists(f"{self.dataclass_json}.lock.lock")
             does_exist = False  # TODO wtf!
-            for _ in range(3):
+            for k in range(5):
                 if self._found_cached_data():
                     does_exist = True
                     break
                 else:
-                    sleep(1.0)
+                    sleep_cancellable(0.05 * 2**k)  # network filesystems might cache attributes
 
             assert does_exist, f"{self.dataclass_json=} must exist!"
             start = time()
-            self._load_cached_data()
+            with trace_span(self, "load_cached_data"), memory_span(
+                self, "load_cached_data"
+            ), using_cache_dir(str(self.cache_dir)) as not_evicted:
+                if not_evicted:
+                    self._load_cached_data()
+            if not not_evicted:  # got evicted right after it was built
+                return self.maybe_build_cache()
             duration = time() - start
+            cache_metrics().observe(self, "load_seconds", duration)
             if duration >= 1.0:
                 print(
                     f"LOADED cached: {self.name} ({self.__class__.__name__}) took: {duration} seconds from {self.cache_dir}"
                 )
 
+    @property
+    def _builds_in_subprocess(self) -> bool:
+        if self.build_in_subprocess is not None:
+            return self.build_in_subprocess
+        return self.__build_in_subprocess__
+
+    def _build_cache_in_subprocess(self):
+        spawned = multiprocessing.get_context("spawn")  # fresh heap, forking a threaded process is unsafe anyhow
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawned) as executor:
+            executor.submit(
+                _build_cache_in_subprocess, self, dict(BASE_PATHES)
+            ).result()
+
     def _pre_build_load_state_fields(self):
         """
         this is getting called before _build_all_children !!
@@ -337,6 +712,16 @@ class CachedData(Buildable, ABC):
         solution would be to directly use the loaded_dc! it is loaded anyhow! which is quite strict, any invalidated "cached"-children could lead to failure of deserialization
         """
         cache_data_json = read_file(self.dataclass_json)
+        if len(self.__build_time_only__) > 0:
+            name2value = self._load_state_fields_except(
+                cache_data_json, self.__build_time_only__
+            )
+            not_decoded = {k: getattr(self, k) for k in self.__build_time_only__}
+            loaded_dc = instantiate_via_importlib(
+                name2value | not_decoded, json.loads(cache_data_json)[CLASS_REF_KEY]
+            )  # shallow: build-time-only children are neither decoded nor instantiated
+            self._check_that_loading_went_well(loaded_dc)
+            return
         loaded_dc = deserialize_dataclass(cache_data_json)
         repr_fields = list(
             f
@@ -354,6 +739,18 @@ class CachedData(Buildable, ABC):
             setattr(self, f.name, getattr(loaded_dc, f.name))
         self._check_that_loading_went_well(loaded_dc)
 
+    def _load_state_fields_except(
+        self, cache_data_json: str, skip_keys: list[str]
+    ) -> dict[str, Any]:
+        """
+        skipped fields are not deserialized, they keep their in-memory values (for example not built build-time-only children)
+        """
+        name2value = deserialize_dataclass_fields(cache_data_json, skip_keys=skip_keys)
+        for f in dataclasses.fields(self):
+            if f.name in name2value:
+                setattr(self, f.name, name2value[f.name])
+        return name2value
+
     def _check_that_loading_went_well(self, loaded_dc):
         """
         currently only checks that hashes match, hashes ignore "state-fields"!!
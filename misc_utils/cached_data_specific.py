@@ -1,7 +1,8 @@
 import dataclasses
+import json
 from abc import abstractmethod
 from dataclasses import dataclass
-from typing import Iterable, ClassVar, Iterator, Any, TypeVar
+from typing import Iterable, ClassVar, Iterator, Any, Optional, TypeVar, Union
 
 from data_io.readwrite_files import (
     write_jsonl,
@@ -10,12 +11,22 @@ from data_io.readwrite_files import (
     write_lines,
     write_dicts_to_csv,
 )
+from misc_utils.build_plan import BUILD, READY
+from misc_utils.buildable import (
+    Buildable,
+    BuildableList,
+    build_independent,
+    current_parallel_build,
+)
 from misc_utils.cached_data import CachedData
 from misc_utils.dataclass_utils import (
+    UNDEFINED,
+    _UNDEFINED,
     encode_dataclass,
     deserialize_dataclass,
 )
-from misc_utils.utils import just_try
+from misc_utils.prefix_suffix import PrefixSuffix
+from misc_utils.utils import iterable_to_chunks, just_try
 from tqdm import tqdm
 import os
 
@@ -103,6 +114,7 @@ class ContinuedCachedData(CachedData):
     """
 
     clean_on_fail: bool = dataclasses.field(default=False, repr=False)
+    __local_tier__: ClassVar[bool] = False  # continues writing into its cache-dir
 
     @property
     def _is_ready(self) -> bool:
@@ -115,6 +127,9 @@ class ContinuedCachedData(CachedData):
     def _claimed_right_to_build_cache(self) -> bool:
         return False
 
+    def _plan_status(self) -> str:
+        return READY if self._was_built else BUILD
+
     def _build_cache(self):
         raise NotImplementedError
 
@@ -200,6 +215,9 @@ class CachedList(CachedData, list):
     def _is_ready(self) -> bool:
         return len(self) > 0
 
+    def _plan_status(self) -> str:
+        return READY if len(self) > 0 else super()._plan_status()
+
     @property
     def data_file(self):
         return self.prefix_cache_dir("data.txt.gz")
@@ -214,3 +232,96 @@ class CachedList(CachedData, list):
     def _post_build_setup(self) -> None:
         assert len(self) == 0, f"CachedList {self} must be empty when before loading"
         self.extend(read_lines(self.data_file))
+
+
+DONE = "done"
+
+
+@dataclass
+class ResumableBuildableList(BuildableList):
+    """
+    for long lists of CachedData: keeps a progress-index (jsonl-file): item-key -> status -> cache_dir
+    after a restart items found in the index are neither checked (_is_ready) nor loaded, they get loaded lazily when accessed
+    -> restart overhead scales with the remaining work, not the total
+    items that are no CachedData are simply built
+    """
+
+    progress_index: Union[_UNDEFINED, PrefixSuffix] = UNDEFINED
+    _lazy: dict[int, dict] = dataclasses.field(
+        default_factory=dict, init=False, repr=False
+    )
+
+    def _read_progress_index(self) -> dict[str, dict]:
+        key2entry = {}
+        if os.path.isfile(str(self.progress_index)):
+            for line in read_lines(str(self.progress_index)):
+                entry = just_try(lambda: json.loads(line), default=None)
+                if entry is not None:  # crashed while writing the last line
+                    key2entry[entry["key"]] = entry
+        return key2entry
+
+    def _record_progress(self, keys: list[str], built: list[Any]):
+        entries = [
+            {
+                "key": key,
+                "status": DONE,
+                "cache_dir": {
+                    "prefix_key": o.cache_dir.prefix_key,
+                    "suffix": o.cache_dir.suffix,
+                },
+            }
+            for key, o in zip(keys, built)
+            if key is not None and isinstance(getattr(o, "cache_dir", None), PrefixSuffix)
+        ]
+        if len(entries) > 0:
+            write_jsonl(str(self.progress_index), entries, mode="ab", do_flush=True)
+
+    def _build_self(self):
+        key2entry = self._read_progress_index()
+        todo: dict[int, Optional[str]] = {}  # key before build, building sets cache_dir
+        for k, obj in enumerate(list.__iter__(self)):
+            key = None
+            if isinstance(obj, CachedData) and not obj._was_built:
+                key = obj._build_session_key()
+                entry = key2entry.get(key, None)
+                if entry is not None and entry["status"] == DONE:
+                    self._lazy[k] = entry
+                    continue
+            if isinstance(obj, Buildable):
+                todo[k] = key
+
+        config = current_parallel_build()
+        chunk_size = config.max_workers if config.is_parallel else 1  # progress is recorded per chunk
+        for chunk in iterable_to_chunks(
+            todo.keys(), is_yieldable_chunk=lambda c: len(c) >= chunk_size
+        ):
+            built = build_independent([list.__getitem__(self, k) for k in chunk])
+            for k, o in zip(chunk, built):
+                list.__setitem__(self, k, o)
+            self._record_progress([todo[k] for k in chunk], built)
+
+    def _load_lazy(self, k: int):
+        entry = self._lazy.pop(k, None)
+        if entry is not None:
+            obj = list.__getitem__(self, k)
+            obj.cache_dir = PrefixSuffix(**entry["cache_dir"])
+            list.__setitem__(self, k, obj.build())
+
+    def __getitem__(self, k):
+        if len(self._lazy) > 0:
+            indizes = range(len(self))[k] if isinstance(k, slice) else [k]
+            indizes = [i + len(self) if i < 0 else i for i in indizes]
+            for i in indizes:
+                self._load_lazy(i)
+        return list.__getitem__(self, k)
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    def _children_to_plan(self) -> Iterator[tuple[str, Any]]:
+        yield from (
+            (f"{k}", o)
+            for k, o in enumerate(list.__iter__(self))
+            if isinstance(o, Buildable)
+        )
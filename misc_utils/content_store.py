@@ -0,0 +1,141 @@
+import os
+import shutil
+import stat
+import uuid
+from typing import Optional
+
+from data_io.readwrite_files import read_json, write_json
+from misc_utils.hashing_utils import hash_file
+from misc_utils.prefix_suffix import BASE_PATHES, PrefixSuffix
+
+CONTENT_STORE = os.environ.get("CONTENT_STORE", "False").lower() != "false"
+CONTENT_STORE_MIN_BYTES = int(os.environ.get("CONTENT_STORE_MIN_BYTES", 1024**2))
+CONTENT_STORE_DIR_NAME = "content_store"
+CONTENT_DIGESTS_FILE = "content_digests.json"  # relative path -> digest, written into every deduplicated cache-dir
+
+_READ_ONLY = ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+
+
+def content_store_dir(cache_dir: PrefixSuffix) -> str:
+    """
+    one store per cache-root (the prefix of the cache-dir), hardlinks only work within a filesystem
+    """
+    return f"{BASE_PATHES[cache_dir.prefix_key]}/{CONTENT_STORE_DIR_NAME}"
+
+
+def _blob_file(store_dir: str, digest: str) -> str:
+    return f"{store_dir}/{digest[:2]}/{digest}"
+
+
+def _link_to_blob(file: str, blob: str):
+    """
+    atomically replaces file by a hardlink to blob, the blob is created from file if it does not exist yet
+    """
+    os.makedirs(os.path.dirname(blob), exist_ok=True)
+    try:
+        os.link(file, blob)
+        os.chmod(blob, os.stat(blob).st_mode & _READ_ONLY)
+        return
+    except FileExistsError:
+        pass
+    if os.path.samefile(file, blob):
+        return
+    tmp_file = f"{file}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        os.link(blob, tmp_file)
+    except FileNotFoundError:  # orphaned blob got just removed
+        return _link_to_blob(file, blob)
+    os.replace(tmp_file, file)
+
+
+def deduplicate_dir(
+    directory: str, store_dir: str, min_bytes: Optional[int] = None
+) -> int:
+    """
+    replaces files of at least min_bytes (default: env-var CONTENT_STORE_MIN_BYTES) by hardlinks to blobs (named by their sha1) in the store_dir
+    linked files are read-only! cache-files must not be changed once the cache is built
+    if the store is on another filesystem nothing gets deduplicated
+    returns saved bytes
+    """
+    min_bytes = min_bytes if min_bytes is not None else CONTENT_STORE_MIN_BYTES
+    os.makedirs(store_dir, exist_ok=True)
+    if os.stat(store_dir).st_dev != os.stat(directory).st_dev:
+        return 0
+    digests: dict[str, str] = {}
+    saved_bytes = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            file = os.path.join(root, name)
+            if os.path.islink(file) or os.path.getsize(file) < min_bytes:
+                continue
+            digest = hash_file(file)
+            blob = _blob_file(store_dir, digest)
+            if os.path.isfile(blob):
+                saved_bytes += os.path.getsize(file)
+            _link_to_blob(file, blob)
+            digests[os.path.relpath(file, directory)] = digest
+    if len(digests) > 0:
+        write_json(f"{directory}/{CONTENT_DIGESTS_FILE}", digests)
+    return saved_bytes
+
+
+def read_digests(directory: str) -> dict[str, str]:
+    """
+    relative path -> digest of the deduplicated files of directory, see: deduplicate_dir
+    """
+    digests_file = f"{directory}/{CONTENT_DIGESTS_FILE}"
+    return read_json(digests_file) if os.path.isfile(digests_file) else {}
+
+
+def link_from_store(dst: str, store_dir: str, digest: str) -> bool:
+    """
+    hardlinks dst to the blob of digest in the store_dir, False if the store_dir has no such blob (yet)
+    """
+    try:
+        os.link(_blob_file(store_dir, digest), dst)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def add_to_store(file: str, store_dir: str, digest: str):
+    """
+    file (with known digest) gets a blob in the store_dir, it is then a read-only hardlink to it
+    """
+    _link_to_blob(file, _blob_file(store_dir, digest))
+
+
+def copytree_deduplicated(src_dir: str, dst_dir: str, dst_store_dir: str):
+    """
+    like shutil.copytree, but files whose digest is known (see: deduplicate_dir) are linked from the dst_store_dir instead of copied
+    copies only the blobs that are not yet in the dst_store_dir
+    for incremental exports see: cache_export.CacheExporter(store_dir=...)
+    """
+    digests = read_digests(src_dir)
+    os.makedirs(dst_store_dir, exist_ok=True)
+
+    def copy_or_link(src: str, dst: str):
+        digest: Optional[str] = digests.get(os.path.relpath(src, src_dir), None)
+        if digest is None:
+            shutil.copy2(src, dst)
+        elif not link_from_store(dst, dst_store_dir, digest):
+            shutil.copy2(src, dst)
+            add_to_store(dst, dst_store_dir, digest)
+
+    shutil.copytree(src_dir, dst_dir, copy_function=copy_or_link)
+
+
+def remove_orphaned_blobs(store_dir: str) -> int:
+    """
+    blobs that are not linked by any cache-file anymore (for example after garbage collection, see: cache_gc)
+    returns freed bytes
+    """
+    freed_bytes = 0
+    for root, _, files in os.walk(store_dir):
+        for name in files:
+            blob = os.path.join(root, name)
+            blob_stat = os.stat(blob)
+            if blob_stat.st_nlink == 1:
+                os.remove(blob)
+                freed_bytes += blob_stat.st_size
+    return freed_bytes
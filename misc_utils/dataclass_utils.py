@@ -123,38 +123,39 @@ CLASS_REF_NO_INSTANTIATE = "_python_dataclass_"  # use this to prevent instantia
 UNSERIALIZABLE = "<UNSERIALIZABLE>"
 
 
+HASH_SKIP_KEYS = [
+    IDKEY,
+    "cache_base",
+    "cache_dir",
+    "use_hash_suffix",
+    "overwrite_cache",
+]
+
+
 def hash_dataclass(
     dc: Dataclass,
-    skip_keys=[
-        IDKEY,
-        "cache_base",
-        "cache_dir",
-        "use_hash_suffix",
-        "overwrite_cache",
-    ],
+    skip_keys: Optional[list[str]] = None,
 ) -> str:
     """
     under, dunder and __exclude_from_hash__ fields are not hashed!
+    same hash as sha1 of serialize_dataclass(dc, skip_keys, encode_for_hash=True)
+    but the serialized subtrees of Buildables are memoized, see: _HashEncoder
     """
+    skip_keys = list(HASH_SKIP_KEYS if skip_keys is None else skip_keys)
     skip_keys += [f.name for f in dataclasses.fields(dc) if is_dunder(f.name)]
-    s = serialize_dataclass(dc, skip_keys=skip_keys, encode_for_hash=True)
+    s = _HashEncoder(skip_keys).dumps(dc)
     hashed_self = sha1(s.encode("utf-8")).hexdigest()
     return hashed_self
 
 
 def hash_dataclass_dict(
     dc: dict,
-    skip_keys=[
-        IDKEY,
-        "cache_base",
-        "cache_dir",
-        "use_hash_suffix",
-        "overwrite_cache",
-    ],
+    skip_keys: Optional[list[str]] = None,
 ) -> str:
     """
     under, dunder and __exclude_from_hash__ fields are not hashed!
     """
+    skip_keys = list(HASH_SKIP_KEYS if skip_keys is None else skip_keys)
     s = serialize_dataclass(dc, skip_keys=skip_keys, encode_for_hash=True)
     hashed_self = sha1(s.encode("utf-8")).hexdigest()
     return hashed_self
@@ -327,6 +328,118 @@ class MyCustomEncoder(json.JSONEncoder):
             return obj
 
 
+HASH_MEMO_KEY = "_hash_memo"
+_JSON_ATOMS = (str, int, float, bool, type(None))
+
+
+def _json_key(k: Any) -> str:
+    if isinstance(k, str):
+        return json.dumps(k, ensure_ascii=False)
+    else:  # json converts int, float, bool and None keys to strings
+        return json.dumps({k: None}, ensure_ascii=False)[1 : -len(": null}")]
+
+
+class _HashEncoder:
+    """
+    produces exactly the same string as MyCustomEncoder with encode_for_hash=True followed by json.dumps
+    but memoizes the string of every dataclass that declares __hash_memoizable__ (Buildable does)
+    memoizable classes must drop their memo (HASH_MEMO_KEY in __dict__) whenever a field gets set
+    a memo is reused if all its field-values are atoms or memoizable children that are themselves unchanged,
+    nodes with containers (lists, dicts, ...) or other objects as field-values are re-serialized (they could be changed in-place)
+    but their children are still taken from memo -> hashing all nodes of a graph re-serializes each node only once
+    """
+
+    def __init__(self, skip_keys: list[str]):
+        self.skip_keys = skip_keys
+        self.memo_key = tuple(skip_keys)
+        self.encoder = MyCustomEncoder()
+        self.encoder.skip_keys = skip_keys
+        self.encoder.encode_for_hash = True
+
+    def dumps(self, obj: Any) -> str:
+        if type(obj) in _JSON_ATOMS:
+            return json.dumps(obj, ensure_ascii=False)
+        elif dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+            if getattr(obj, "__hash_memoizable__", False):
+                return self._memoized(obj)
+            else:
+                return self._dataclass(obj)[0]
+        elif type(obj) in (list, tuple):
+            return "[" + ", ".join(self.dumps(v) for v in obj) + "]"
+        elif type(obj) is dict:
+            items = (
+                (self.encoder._asdict_inner(k, dict), v)
+                for k, v in obj.items()
+                if k not in self.skip_keys
+            )
+            return (
+                "{"
+                + ", ".join(f"{_json_key(k)}: {self.dumps(v)}" for k, v in items)
+                + "}"
+            )
+        else:
+            return self._fallback(obj)
+
+    def _fallback(self, obj: Any) -> str:
+        return json.dumps(self.encoder._asdict_inner(obj, dict), ensure_ascii=False)
+
+    def _memoized(self, obj: Any) -> str:
+        memo = obj.__dict__.get(HASH_MEMO_KEY, None)
+        if memo is not None and self.memo_key in memo:
+            s, children = memo[self.memo_key]
+            if children is not None and all(
+                self.dumps(child) is child_s for child, child_s in children
+            ):
+                return s
+        s, children = self._dataclass(obj)
+        obj.__dict__.setdefault(HASH_MEMO_KEY, {})[self.memo_key] = (s, children)
+        return s
+
+    def _dataclass(
+        self, obj: Any
+    ) -> tuple[str, Optional[tuple[tuple[Any, str], ...]]]:
+        """
+        returns the json-string and the memoizable children it depends on, None if it cannot be memoized
+        """
+        if IDKEY not in self.skip_keys or hasattr(obj, "__serializable_properties__"):
+            return self._fallback(obj), None
+
+        result: list[tuple[str, str]] = []
+        module = obj.__class__.__module__
+        if module == "__main__":
+            module = fix_module_if_class_in_same_file_as_main(obj)
+        if CLASS_REF_KEY not in self.skip_keys:
+            _target_ = f"{module}.{obj.__class__.__name__}"
+            result.append((CLASS_REF_KEY, json.dumps(_target_, ensure_ascii=False)))
+
+        excluded = getattr(obj, "__exclude_from_hash__", [])
+        children: Optional[list[tuple[Any, str]]] = []
+        for f in dataclasses.fields(obj):
+            if (
+                not f.repr
+                or not hasattr(obj, f.name)
+                or f.name.startswith("_")
+                or f.name in excluded
+                or f.name in self.skip_keys
+            ):
+                continue
+            value = getattr(obj, f.name)
+            if value is UNDEFINED:
+                continue
+            s = self.dumps(value)
+            result.append((f.name, s))
+            if getattr(value, "__hash_memoizable__", False) and not isinstance(
+                value, type
+            ):
+                if children is not None:
+                    children.append((value, s))
+            elif type(value) not in _JSON_ATOMS:
+                children = None
+
+        s = "{" + ", ".join(f"{_json_key(k)}: {v}" for k, v in result) + "}"
+        return s, tuple(children) if children is not None else None
+
+
 class MyDecoder(json.JSONDecoder):
     """
     # see https://stackoverflow.com/questions/48991911/how-to-write-a-custom-json-decoder-for-a-complex-object
@@ -444,6 +557,17 @@ def deserialize_dataclass(o: NeStr) -> Dataclass:
     return o
 
 
+@beartype
+def deserialize_dataclass_fields(o: NeStr, skip_keys: list[str]) -> dict[str, Any]:
+    """
+    decodes the fields of a serialized dataclass, but does NOT instantiate the dataclass itself
+    fields in skip_keys are not even decoded, so nested dataclasses in there are never instantiated
+    """
+    dct = json.loads(o, cls=Base64Decoder)
+    dct = {k: v for k, v in dct.items() if k not in SPECIAL_KEYS + skip_keys}
+    return _json_loads_decode_dataclass(json.dumps(dct))
+
+
 def serialize_dataclass(
     d: Union[str, Dataclass],  # TODO: WTF why str?
     class_reference_key=CLASS_REF_KEY,
@@ -477,12 +601,14 @@ def encode_dataclass(
     """
     encode in the sense that the dictionary representation can be decoded to the nested dataclasses object again
     """
-    MyCustomEncoder.class_reference_key = class_reference_key
-    MyCustomEncoder.skip_undefined = skip_undefined
-    MyCustomEncoder.skip_keys = skip_keys
-    MyCustomEncoder.sparse = sparse
-    MyCustomEncoder.encode_for_hash = encode_for_hash
-    return MyCustomEncoder().default(d)
+    # setting instance- not class-attributes, cause children might get serialized/hashed in parallel threads
+    encoder = MyCustomEncoder()
+    encoder.class_reference_key = class_reference_key
+    encoder.skip_undefined = skip_undefined
+    encoder.skip_keys = skip_keys
+    encoder.sparse = sparse
+    encoder.encode_for_hash = encode_for_hash
+    return encoder.default(d)
 
 
 @beartype
@@ -513,14 +639,25 @@ FILLME = Union[T, _UNDEFINED]  # TODO: destroys IDE argument hint
 #     pass
 
 
+_CLASS2PUBLIC_INIT_FIELDS: dict[type, list[str]] = {}
+
+
+def _public_init_field_names(clazz: type) -> list[str]:
+    if clazz not in _CLASS2PUBLIC_INIT_FIELDS:
+        _CLASS2PUBLIC_INIT_FIELDS[clazz] = [
+            f.name
+            for f in dataclasses.fields(clazz)
+            if not f.name.startswith("_") and f.init
+        ]
+    return _CLASS2PUBLIC_INIT_FIELDS[clazz]
+
+
 def all_undefined_must_be_filled(obj, extra_field_names: Optional[list[str]] = None):
-    field_names = [
-        f.name for f in dataclasses.fields(obj) if not f.name.startswith("_") and f.init
-    ]
+    field_names = _public_init_field_names(type(obj))
     if (
         extra_field_names is not None
     ):  # property overwritten by field still not listed in dataclasses.fields!
-        field_names += extra_field_names
+        field_names = field_names + extra_field_names
     for f_name in field_names:
         if hasattr(obj, f_name) and getattr(obj, f_name) is UNDEFINED:
             raise AssertionError(
@@ -1,50 +1,268 @@
+import ctypes
+import ctypes.util
+import fcntl
+import json
 import multiprocessing
 import os
-from pathlib import Path
-from time import sleep
+import select
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from time import sleep, time
+from typing import Iterator, Optional
 
-import filelock
-from filelock import FileLock
+from misc_utils.build_cancellation import raise_if_cancelled
 
-from data_io.readwrite_files import write_file
+_IN_DELETE = 0x00000200
+_IN_MOVED_FROM = 0x00000040
 
+CLAIM_STALE_SECONDS = float(os.environ.get("CLAIM_STALE_SECONDS", 600))
 
-def claim_write_access(file_or_dir: str) -> bool:
+
+def _claim_owner() -> dict:
+    return {
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+        "name": multiprocessing.current_process().name,
+        "time": time(),
+    }
+
+
+def _read_claim(claim_file: str) -> Optional[str]:
+    try:
+        with open(claim_file) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _pid_is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # alive, but not ours
+        pass
+    return True
+
+
+def claim_is_stale(claim_file: str, stale_seconds: Optional[float] = None) -> bool:
+    """
+    stale if its owner (same host) is dead or its heartbeat (mtime, see: claim_heartbeat) is older than stale_seconds
+    owners on other hosts can only be judged by their heartbeat
+    """
+    stale_seconds = stale_seconds if stale_seconds is not None else CLAIM_STALE_SECONDS
+    try:
+        age = time() - os.path.getmtime(claim_file)
+    except FileNotFoundError:
+        return False  # released
+    try:
+        owner = json.loads(_read_claim(claim_file) or "")
+    except ValueError:  # written before claims had an owner or being written right now
+        owner = None
+    if (
+        isinstance(owner, dict)
+        and owner.get("host") == socket.gethostname()
+        and not _pid_is_alive(owner["pid"])
+    ):
+        return True
+    return age > stale_seconds
+
+
+def break_stale_claim(claim_file: str, stale_seconds: Optional[float] = None) -> bool:
     """
-    if false, someone else already claimed it!
+    returns True if the claim was stale and got removed
+    the claim-file is renamed before it is checked again, so of many breakers only one removes it
     """
-    claimed_rights_to_write = False
-    lock_file = f"{file_or_dir}.lock"
-    lock_lock_file = f"{file_or_dir}.lock.lock"
-    lock_path = Path(lock_file).parent
-    lock_path.mkdir(parents=True, exist_ok=True)
-    me = multiprocessing.current_process().name
+    content = _read_claim(claim_file)
+    if content is None or not claim_is_stale(claim_file, stale_seconds):
+        return False
+    broken_file = f"{claim_file}.{uuid.uuid4().hex[:8]}.stale"
+    try:
+        os.rename(claim_file, broken_file)
+    except FileNotFoundError:
+        return False
+    if _read_claim(broken_file) != content:  # got released and claimed again meanwhile
+        try:
+            os.link(broken_file, claim_file)  # fails if claimed yet again
+        except FileExistsError:
+            pass
+        os.remove(broken_file)
+        return False
+    os.remove(broken_file)
+    print(f"removed stale claim: {claim_file}, owner was: {content}")
+    return True
+
+
+def claim_write_access(file_or_dir: str, claim_file: Optional[str] = None) -> bool:
+    """
+    if false, someone else already claimed it or it already exists!
+    atomic: the claim-file gets created with O_EXCL (also atomic on NFSv3+), the one who created it owns the claim
+    claim-file contains host, pid and time of its owner, stale claims (see: claim_is_stale) of crashed owners get broken
+    release the claim by removing the claim-file, AFTER file_or_dir got written
+    claim_file: defaults to {file_or_dir}.lock.lock
+    """
+    claim_file = claim_file if claim_file is not None else f"{file_or_dir}.lock.lock"
 
     def already_existent():
         return os.path.isfile(file_or_dir) or os.path.isdir(file_or_dir)
 
-    while not os.path.isfile(lock_file) and not already_existent():
+    if already_existent():
+        return False
+    os.makedirs(os.path.dirname(claim_file) or ".", exist_ok=True)
+    try:
+        fd = os.open(claim_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if not break_stale_claim(claim_file):
+            return False
+        return claim_write_access(file_or_dir, claim_file)
+    with os.fdopen(fd, "w") as f:
+        f.write(json.dumps(_claim_owner()))
+
+    if already_existent():  # previous owner finished between our check and our claim
+        os.remove(claim_file)
+        return False
+    return True
+
+
+@contextmanager
+def claim_heartbeat(claim_file: str, interval: Optional[float] = None):
+    """
+    touches the claim-file every interval seconds (default: CLAIM_STALE_SECONDS/10), so it does not become stale while building
+    """
+    interval = interval if interval is not None else CLAIM_STALE_SECONDS / 10
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            try:
+                os.utime(claim_file)
+            except FileNotFoundError:
+                return  # got broken by someone else (who considered it stale)
+
+    heart = threading.Thread(target=beat, name="claim_heartbeat", daemon=True)
+    heart.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        heart.join()
+
+
+class _DirWatcher:
+    """
+    inotify (linux only) on a directory, wakes up waiters as soon as a file in it gets removed or renamed
+    does NOT notice changes made by other hosts on network filesystems -> always wait with a timeout!
+    """
+
+    def __init__(self, directory: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(
+            self.fd, directory.encode("utf-8"), _IN_DELETE | _IN_MOVED_FROM
+        )
+        if wd < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout: float) -> bool:
+        """
+        True if woken up by an event
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if len(readable) > 0:
+            os.read(self.fd, 64 * 1024)  # drain events, the caller checks what changed
+        return len(readable) > 0
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _dir_watcher(directory: str) -> Optional[_DirWatcher]:
+    try:
+        return _DirWatcher(directory)
+    except (OSError, AttributeError):  # not linux, no libc, directory missing, ...
+        return None
+
+
+def wait_until_removed(
+    file: str, timeout: Optional[float] = None, max_poll_interval: float = 1.0
+) -> bool:
+    """
+    event-driven (inotify) if possible, additionally polls with exponential backoff (10ms ... max_poll_interval)
+    returns False if the file still exists after timeout seconds
+    raises if the build got cancelled, see: build_cancellation
+    """
+    deadline = time() + timeout if timeout is not None else None
+    watcher = _dir_watcher(os.path.dirname(file) or ".")
+    poll_interval = 0.01
+    try:
+        while os.path.exists(file):
+            raise_if_cancelled()
+            if deadline is not None and time() >= deadline:
+                return False
+            wait_seconds = (
+                poll_interval
+                if deadline is None
+                else max(0.0, min(poll_interval, deadline - time()))
+            )
+            if watcher is not None:
+                watcher.wait(wait_seconds)
+            else:
+                sleep(wait_seconds)
+            poll_interval = min(2 * poll_interval, max_poll_interval)
+    finally:
+        if watcher is not None:
+            watcher.close()
+    return True
+
+
+def _same_dir(directory: str, fd: int) -> bool:
+    try:
+        stat, fstat = os.stat(directory), os.fstat(fd)
+    except FileNotFoundError:
+        return False
+    return (stat.st_dev, stat.st_ino) == (fstat.st_dev, fstat.st_ino)
+
+
+@contextmanager
+def shared_dir_lock(directory: str) -> Iterator[bool]:
+    """
+    flock on the directory itself, blocks while someone holds the exclusive_dir_lock
+    yields False if the directory does not exist (anymore), it could have been removed/renamed while waiting for the lock
+    local to this host! flock on a directory is not forwarded to NFS-servers, holders on other hosts are not seen
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except FileNotFoundError:
+        yield False
+        return
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        yield _same_dir(directory, fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def exclusive_dir_lock(directory: str) -> Iterator[bool]:
+    """
+    non-blocking, yields False if anyone on this host holds a shared_dir_lock (or the directory does not exist)
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except FileNotFoundError:
+        yield False
+        return
+    try:
         try:
-            filelock_timeout = 0.1
-            with FileLock(lock_file, timeout=filelock_timeout):
-                # print(f"{me=}: {datetime.now()}")
-                # TODO: not working like this!
-                # even though I manually force flushing, still seems to be some buffering/delay in writing to the file, -> writing to file not "real-time", not thread-safe
-                # if len(read_file(lock_file))==0:
-                #     write_file(lock_file, me,do_flush=True) #
-                #     # sleep(1.0)
-                #     claimed_rights_to_write=True
-                #     print(f"{me=}: {datetime.now()}")
-
-                if not os.path.isfile(lock_lock_file) and not already_existent():
-                    write_file(lock_lock_file, me)
-                    sleep(2 * filelock_timeout)  # enforce other FileLocks to time-out!
-                    claimed_rights_to_write = True
-                break
-        except filelock._error.Timeout:
-            # pass
-            print("retry claim_write_access")
-            # sys.stdout.write(fail_message)
-            # sys.stdout.flush()
-            # fail_message = "."
-    return claimed_rights_to_write
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            locked = _same_dir(directory, fd)
+        except BlockingIOError:
+            locked = False
+        yield locked
+    finally:
+        os.close(fd)
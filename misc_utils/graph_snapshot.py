@@ -0,0 +1,82 @@
+import os
+import pickle
+import uuid
+from hashlib import sha1
+from typing import Any, Optional
+
+from misc_utils.buildable import Buildable
+from misc_utils.dataclass_utils import hash_dataclass
+from misc_utils.prefix_suffix import BASE_PATHES
+from misc_utils.utils import just_try
+
+GRAPH_SNAPSHOTS_DIR_NAME = "graph_snapshots"
+
+
+def _resolved_cache_bases(root: Buildable) -> list[str]:
+    """
+    cache_bases are excluded from hash_dataclass, resolved (via BASE_PATHES) they tell where the graph's caches are
+    """
+    seen: set[int] = set()
+    cache_bases: set[str] = set()
+
+    def collect(obj: Any):
+        if id(obj) in seen or getattr(obj, "__plan_ignore__", True):
+            return
+        seen.add(id(obj))
+        cache_base = getattr(obj, "cache_base", None)
+        if cache_base is not None:
+            cache_bases.add(str(cache_base))
+        for _, child in obj._children_to_plan():
+            collect(child)
+
+    collect(root)
+    return sorted(cache_bases)
+
+
+def snapshot_file(root: Buildable, snapshot_dir: str) -> str:
+    """
+    named by the root's hash and its resolved cache_bases, so any change of the graph's config invalidates the snapshot
+    and graphs of same config but different cache-locations (BASE_PATHES) do not share it
+    """
+    cache_bases = "\n".join(_resolved_cache_bases(root))
+    cache_bases_hash = sha1(cache_bases.encode("utf-8")).hexdigest()
+    return f"{snapshot_dir}/{type(root).__name__}-{hash_dataclass(root)}-{cache_bases_hash}.pkl"
+
+
+def build_with_snapshot(root: Buildable, snapshot_dir: Optional[str] = None) -> Any:
+    """
+    restores the entire built graph (state of every node, shape-shifted children, everything set up in _post_build_setup) in one read
+    instead of walking the graph and loading every CachedData from its cache-dir
+    if there is no snapshot yet, the graph gets built and a snapshot is written
+    snapshot_dir defaults to: BASE_PATHES["cache_root"]/graph_snapshots
+
+    built graph must be picklable, if it is not it is just not snapshotted
+    snapshot does NOT notice caches that got deleted or overwritten, remove it in that case
+    """
+    if snapshot_dir is None:
+        assert (
+            "cache_root" in BASE_PATHES
+        ), f"either give a snapshot_dir or set BASE_PATHES['cache_root']"
+        snapshot_dir = f"{BASE_PATHES['cache_root']}/{GRAPH_SNAPSHOTS_DIR_NAME}"
+    file = snapshot_file(root, snapshot_dir)
+    if os.path.isfile(file):
+        with open(file, "rb") as f:
+            return pickle.load(f)
+
+    built = root.build()
+    os.makedirs(snapshot_dir, exist_ok=True)
+    tmp_file = f"{file}.{uuid.uuid4()}.tmp"  # other processes must never read half-written snapshots
+
+    def write_snapshot():
+        with open(tmp_file, "wb") as f:
+            pickle.dump(built, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, file)
+
+    just_try(
+        write_snapshot,
+        verbose=True,
+        fail_print_message_supplier=lambda: f"could not snapshot {type(root).__name__}",
+    )
+    if os.path.isfile(tmp_file):
+        os.remove(tmp_file)
+    return built
@@ -15,6 +15,7 @@ class PrefixSuffix(Buildable):
 
     prefix: str = dataclasses.field(init=False)
     __exclude_from_hash__: ClassVar[list[str]] = ["prefix"]
+    __plan_ignore__: ClassVar[bool] = True  # trivial, building it is just setting the prefix
 
     def _set_prefix(self):
         self.prefix = BASE_PATHES[self.prefix_key]
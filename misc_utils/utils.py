@@ -126,6 +126,11 @@ class Singleton(type):
 
     _instances = {}
 
+    def __new__(mcs, name, bases, namespace):
+        # unpickling/deepcopying would otherwise create another instance, breaking "is"-checks (PARALLEL_BUILD.use_processes)
+        namespace.setdefault("__reduce__", lambda self: (type(self), ()))
+        return super().__new__(mcs, name, bases, namespace)
+
     def __call__(cls, *args, **kwargs):
         if cls not in cls._instances:
             cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
@@ -1,4 +1,8 @@
+import asyncio
+import threading
+from contextlib import contextmanager
 from pprint import pprint
+from time import sleep, time
 from typing import Annotated, Generic, TypeVar, Any
 
 from beartype.roar import BeartypeDecorHintPep585DeprecationWarning
@@ -9,7 +13,23 @@ from misc_utils import beartyped_dataclass_patch
 
 from dataclasses import dataclass, field
 
-from misc_utils.buildable import Buildable, BuildableContainer, BuildableList
+from typing import ClassVar, Optional
+
+from misc_utils.build_cancellation import (
+    BuildCancelled,
+    BuildTimeout,
+    cancellation_scope,
+    sleep_cancellable,
+)
+from misc_utils.build_memory import BuildMemoryProfiler
+from misc_utils.buildable import (
+    Buildable,
+    BuildableContainer,
+    BuildableList,
+    PARALLEL_BUILD,
+    ParallelBuildConfig,
+    parallel_build,
+)
 from misc_utils.dataclass_utils import (
     serialize_dataclass,
     deserialize_dataclass,
@@ -103,3 +123,363 @@ def test_buildable_list():
     print(s)
     o2 = deserialize_dataclass(s)
     assert o.data[0].state == o2.data[0].state
+
+
+class Concurrency:
+    """
+    how many nodes were building at the same time, tests behavior instead of wall-clock durations
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    @contextmanager
+    def track(self):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def reset(self):
+        with self._lock:
+            self.peak = self.running
+
+
+CONCURRENCY = Concurrency()
+
+
+@dataclass
+class SlowShapeShifter(Buildable):
+    sleep_time: float = 0.2
+
+    def _build_self(self):
+        with CONCURRENCY.track():
+            sleep(self.sleep_time)
+        return threading.current_thread().name
+
+
+@dataclass
+class ParentOfSlowOnes(Buildable):
+    first: SlowShapeShifter
+    second: SlowShapeShifter
+    more: BuildableList[SlowShapeShifter]
+
+
+def test_parallel_build():
+    def create():
+        return ParentOfSlowOnes(
+            first=SlowShapeShifter(),
+            second=SlowShapeShifter(),
+            more=BuildableList([SlowShapeShifter(), SlowShapeShifter()]),
+        )
+
+    CONCURRENCY.reset()
+    with parallel_build(max_workers=4):
+        o = create().build()
+    assert CONCURRENCY.peak >= 2, f"{CONCURRENCY.peak=}"
+    assert isinstance(o.first, str) and isinstance(o.second, str)
+    assert all(isinstance(x, str) for x in o.more)
+    assert o.first != o.second, "should have been built by different threads"
+
+    CONCURRENCY.reset()
+    create().build()
+    assert CONCURRENCY.peak == 1, "default is sequential building"
+
+
+@dataclass
+class ParentWithPlainContainers(Buildable):
+    name: str
+    as_list: list[SlowShapeShifter]
+    as_dict: dict[str, SlowShapeShifter]
+    as_tuple: tuple[AnotherTestBuildable, ...]
+
+
+@dataclass
+class Trivial(Buildable):
+    value: int = 0
+
+    def _build_self(self):
+        pass
+
+
+def test_trivial_nodes_skip_optional_features(monkeypatch):
+    """
+    node-throughput: the context-managers of tracing, memory-profiling, parallel building, ... cost more than a trivial node
+    """
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("optional build-feature is off")
+
+    for name in ["trace_span", "memory_span"]:
+        monkeypatch.setattr(f"misc_utils.buildable.{name}", unexpected)
+    monkeypatch.setattr(type(PARALLEL_BUILD), "hold_slot", unexpected)
+    monkeypatch.setattr(Trivial, "_build_node", unexpected)
+    built = BuildableList([Trivial(value=k) for k in range(1000)]).build()
+    assert all(t._was_built for t in built)
+
+
+def test_children_in_plain_containers():
+    o = ParentWithPlainContainers(
+        name="foo",
+        as_list=[SlowShapeShifter(0.0)],
+        as_dict={"a": SlowShapeShifter(0.0)},
+        as_tuple=(AnotherTestBuildable(),),
+    ).build()
+    assert isinstance(o.as_list[0], str)
+    assert isinstance(o.as_dict["a"], str)
+    assert o.as_tuple[0].state == EXPECTED_STATE
+    assert [path for path, _ in o._children()] == ["as_tuple.0"]
+
+
+ASYNC_CONCURRENCY = Concurrency()
+
+
+@dataclass
+class AsyncSleeper(Buildable):
+    sleep_time: float = 0.2
+
+    async def _build_self(self):
+        with ASYNC_CONCURRENCY.track():
+            await asyncio.sleep(self.sleep_time)
+        return "slept"
+
+
+@dataclass
+class ParentOfSleepers(Buildable):
+    async_ones: list[AsyncSleeper]
+    sync_ones: BuildableList[SlowShapeShifter]
+
+
+def test_abuild():
+    o = ParentOfSleepers(
+        async_ones=[AsyncSleeper() for _ in range(10)],
+        sync_ones=BuildableList([SlowShapeShifter() for _ in range(10)]),
+    )
+    CONCURRENCY.reset()
+    ASYNC_CONCURRENCY.reset()
+    o = asyncio.run(o.abuild())
+    assert ASYNC_CONCURRENCY.peak > 1, "async ones awaited concurrently"
+    assert CONCURRENCY.peak > 1, "sync ones built in the executor concurrently"
+    assert o.async_ones == ["slept"] * 10
+    assert all(name.startswith("abuild") for name in o.sync_ones)
+
+    assert AsyncSleeper(0.0).build() == "slept", "sync build also supports async _build_self"
+
+
+@dataclass
+class WithChild(Buildable):
+    child: AnotherTestBuildable
+
+    def _build_self(self):
+        pass
+
+
+def test_buildable_list_stream():
+    l = BuildableList([AnotherTestBuildable() for _ in range(5)])
+    states = list(l.stream(consumer=lambda o: o.state, window=2))
+    assert states == [EXPECTED_STATE] * 5
+    assert not any(o._was_built for o in l), "list keeps the unbuilt items"
+
+    streamed = list(BuildableList([SlowShapeShifter(0.0)]).stream())
+    assert streamed == ["MainThread"]
+
+    built_child = AnotherTestBuildable().build()
+    l = BuildableList([WithChild(built_child), WithChild(AnotherTestBuildable())])
+    children = list(l.stream(consumer=lambda o: o.child))
+    assert children[0] is built_child, "built nodes are shared, not copied"
+    assert children[1] is not l[1].child and not l[1].child._was_built
+
+
+@dataclass
+class MemoryHog(Buildable):
+    temporary_mb: int = 0
+    retained_mb: int = 0
+    retained: bytearray = field(init=False, repr=False)
+
+    @property
+    def name(self):
+        return f"hog{self.temporary_mb}-{self.retained_mb}"
+
+    def _build_self(self):
+        temporary = bytearray(self.temporary_mb * 1024**2)
+        del temporary
+        self.retained = bytearray(self.retained_mb * 1024**2)
+
+
+def test_memory_profiler():
+    with BuildMemoryProfiler() as profiler:
+        BuildableList([MemoryHog(temporary_mb=30), MemoryHog(retained_mb=10)]).build()
+
+    heaviest = [(r.node, r.phase) for r in profiler.heaviest(top_k=3)]
+    assert heaviest == [
+        ("BuildableList", "build_self"),
+        ("MemoryHog-hog30-0", "build_self"),
+        ("MemoryHog-hog0-10", "build_self"),
+    ]
+    node2record = {r.node: r for r in profiler.records}
+    assert node2record["MemoryHog-hog30-0"].peak_mb >= 30
+    assert node2record["MemoryHog-hog30-0"].retained_mb < 1
+    assert node2record["MemoryHog-hog0-10"].retained_mb >= 10
+    assert node2record["BuildableList"].peak_mb >= 30
+    assert "MemoryHog-hog30-0" in profiler.report()
+
+
+@dataclass
+class CancellableSleeper(Buildable):
+    sleep_time: float = 5.0
+    was_done: bool = field(default=False, init=False)
+
+    def _build_self(self):
+        sleep_cancellable(self.sleep_time)
+        self.was_done = True
+
+
+@dataclass
+class Failing(Buildable):
+    def _build_self(self):
+        sleep(0.1)
+        raise ValueError("doomed")
+
+
+@dataclass
+class ParentOfDoomed(Buildable):
+    sleeper: CancellableSleeper
+    failing: Failing
+
+
+@dataclass
+class SleeperWithTimeout(CancellableSleeper):
+    __build_timeout__: ClassVar[Optional[float]] = 0.2
+
+
+def _raises(fun, error_type) -> bool:
+    try:
+        fun()
+    except error_type:
+        return True
+    return False
+
+
+def test_failing_sibling_cancels_others():
+    sleeper = CancellableSleeper()
+    with parallel_build(max_workers=2):
+        start = time()
+        assert _raises(
+            lambda: ParentOfDoomed(sleeper=sleeper, failing=Failing()).build(),
+            ValueError,
+        )
+    assert time() - start < 2.0
+    assert not sleeper.was_done
+
+
+RELEASE_UNCOOPERATIVE = threading.Event()
+
+
+@dataclass
+class Uncooperative(Buildable):
+    was_done: bool = field(default=False, init=False)
+
+    def _build_self(self):
+        RELEASE_UNCOOPERATIVE.wait(timeout=10.0)  # never checks for cancellation
+        self.was_done = True
+
+
+@dataclass
+class ParentOfUncooperative(Buildable):
+    uncooperative: Uncooperative
+    failing: Failing
+
+
+def test_failing_sibling_does_not_wait_for_others_to_stop():
+    uncooperative = Uncooperative()
+    with parallel_build(max_workers=2):
+        assert _raises(
+            lambda: ParentOfUncooperative(
+                uncooperative=uncooperative, failing=Failing()
+            ).build(),
+            ValueError,
+        )
+    assert not uncooperative.was_done, "raised while the sibling was still running"
+    RELEASE_UNCOOPERATIVE.set()
+
+
+def test_timeouts():
+    start = time()
+    assert _raises(lambda: SleeperWithTimeout().build(), BuildTimeout)
+    assert time() - start < 2.0
+
+    with cancellation_scope(timeout=0.2):
+        assert _raises(lambda: CancellableSleeper().build(), BuildTimeout)
+
+    with cancellation_scope() as token:
+        token.cancel("not needed anymore")
+        assert _raises(lambda: CancellableSleeper().build(), BuildCancelled)
+
+
+@dataclass
+class MemoryHungry(SlowShapeShifter):
+    __build_resources__: ClassVar[dict[str, float]] = {"mem_gb": 2.0}
+
+
+def test_resource_budget():
+    def build_three(budget: float) -> int:
+        parent = ParentOfSlowOnes(
+            first=MemoryHungry(),
+            second=MemoryHungry(),
+            more=BuildableList([MemoryHungry()]),
+        )
+        CONCURRENCY.reset()
+        with parallel_build(max_workers=4, resources={"mem_gb": budget}):
+            parent.build()
+        return CONCURRENCY.peak
+
+    assert build_three(budget=6.0) >= 2
+    assert build_three(budget=3.0) == 1, "only one at a time fits into the budget"
+    assert build_three(budget=1.0) == 1, "too hungry ones run alone"
+
+
+def test_lock_order_budget_then_slot():
+    """
+    slot_holder holds a slot and builds a nested node that needs the gpu, gpu_holder holds the gpu and waits for a slot
+    with the other slot blocked (by blocker) this was a dead-lock before budget-then-slot was the lock-order everywhere
+    """
+    config = ParallelBuildConfig(max_workers=2, resources={"gpu": 1})
+    slots_taken = threading.Barrier(3)
+    done = threading.Event()
+
+    def slot_holder():
+        with config.hold_slot():
+            slots_taken.wait()
+            while config._budget._available["gpu"] > 0:  # gpu_holder got the gpu
+                sleep(0.01)
+            with config.hold_slot({"gpu": 1}):
+                pass
+        done.set()
+
+    def blocker():
+        with config.hold_slot():
+            slots_taken.wait()
+            done.wait(timeout=30)
+
+    def gpu_holder():
+        slots_taken.wait()
+        with config.hold_slot({"gpu": 1}):
+            pass
+
+    threads = [
+        threading.Thread(target=f, daemon=True)
+        for f in [slot_holder, blocker, gpu_holder]
+    ]
+    for t in threads:
+        t.start()
+    deadline = time() + 5
+    for t in threads:
+        t.join(timeout=max(0.0, deadline - time()))
+    assert not any(t.is_alive() for t in threads), "dead-lock"
+    assert done.is_set()
@@ -1,23 +1,66 @@
-from typing import Any
+from typing import Any, ClassVar
 from warnings import filterwarnings
 
 from beartype.roar import BeartypeDecorHintPep585DeprecationWarning
 
 filterwarnings("ignore", category=BeartypeDecorHintPep585DeprecationWarning)
 
+import copy
+import errno
+import os
+import pickle
 import shutil
+import socket
+import subprocess
+import threading
+from hashlib import sha1
+from time import sleep, time
+
+import pytest
+from contextlib import contextmanager
 from dataclasses import field, dataclass
 
-from data_io.readwrite_files import read_json
+from data_io.readwrite_files import read_json, write_json
+from misc_utils.buildable import BuildableContainer, BuildableList, parallel_build
+from misc_utils.build_durations import (
+    build_durations,
+    critical_path_first,
+    critical_path_scope,
+    estimate_seconds,
+)
+from misc_utils.build_plan import BUILD, LOAD, SKIP
+from misc_utils.build_registry import BuildRegistry
+from misc_utils.build_session import BuildSession, current_build_session
+from misc_utils.build_tracing import BuildTracer
+from misc_utils.cached_data_specific import ResumableBuildableList
 from misc_utils.cached_data import (
+    STAGING_SUFFIX,
     CachedData,
     _CREATE_CACHE_DIR_IN_BASE_DIR,
     CREATE_CACHE_DIR_IN_BASE_DIR,
+    using_cache_dir,
 )
+from misc_utils.cache_export import export_cache_tree
+from misc_utils.cache_gc import cache_dirs, collect_garbage
+from misc_utils.cache_metrics import cache_metrics
+from misc_utils.cache_tiers import local_tier
+from misc_utils.content_store import CONTENT_STORE_DIR_NAME, remove_orphaned_blobs
 from misc_utils.dataclass_utils import (
+    HASH_MEMO_KEY,
+    HASH_SKIP_KEYS,
+    hash_dataclass,
+    serialize_dataclass,
     shallow_dataclass_from_dict,
     encode_dataclass,
 )
+from misc_utils.cache_manifest import CACHED, manifest_of
+from misc_utils.filelock_utils import (
+    _DirWatcher,
+    claim_write_access,
+    wait_until_removed,
+)
+from misc_utils.graph_snapshot import build_with_snapshot
+from misc_utils.prefix_suffix import BASE_PATHES, PrefixSuffix
 
 
 @dataclass
@@ -79,3 +122,690 @@ def test_CreateCacheDirInCacheBase():
     assert CREATE_CACHE_DIR_IN_BASE_DIR is _CREATE_CACHE_DIR_IN_BASE_DIR()
     assert _CREATE_CACHE_DIR_IN_BASE_DIR() is _CREATE_CACHE_DIR_IN_BASE_DIR()
     assert id(CREATE_CACHE_DIR_IN_BASE_DIR) == id(_CREATE_CACHE_DIR_IN_BASE_DIR())
+    assert pickle.loads(pickle.dumps(CREATE_CACHE_DIR_IN_BASE_DIR)) is CREATE_CACHE_DIR_IN_BASE_DIR
+    assert copy.deepcopy(CREATE_CACHE_DIR_IN_BASE_DIR) is CREATE_CACHE_DIR_IN_BASE_DIR
+
+
+@dataclass
+class CountingData(CachedData):
+    value: str = "foo"
+    num_setups: int = field(default=0, init=False, repr=False)
+
+    @property
+    def name(self):
+        return self.value
+
+    def _build_cache(self):
+        pass
+
+    def _post_build_setup(self):
+        self.num_setups += 1
+
+
+def test_build_session_deduplicates(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "counting")
+    l = BuildableList(
+        [CountingData(cache_base=cache_base) for _ in range(3)]
+        + [CountingData(value="bar", cache_base=cache_base)]
+    )
+    with BuildSession():
+        built = l.build()
+    assert built[0] is built[1] is built[2]
+    assert built[0] is not built[3]
+    assert built[0].num_setups == 1
+
+
+def test_build_session_is_local_to_its_context(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "counting")
+    seen_by_unrelated_thread = []
+    with BuildSession():
+        unrelated = threading.Thread(
+            target=lambda: seen_by_unrelated_thread.append(current_build_session())
+        )
+        unrelated.start()
+        unrelated.join()
+        with parallel_build(max_workers=2):
+            built = BuildableList(
+                [CountingData(cache_base=cache_base) for _ in range(2)]
+            ).build()
+    assert seen_by_unrelated_thread == [None]
+    assert built[0] is built[1], "threads of a parallel build inherit the session"
+    assert current_build_session() is None
+
+
+def test_parallel_build_in_processes(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "processes")
+    with parallel_build(max_workers=2, use_processes=True):
+        built = BuildableList(
+            [CountingData(value=v, cache_base=cache_base) for v in "ab"]
+        ).build()
+    assert [d.value for d in built] == ["a", "b"]
+    assert all(os.path.isfile(d.dataclass_json) for d in built)
+
+
+def test_deduplicated_nodes_are_built(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "counting")
+    container = BuildableContainer(
+        [CountingData(cache_base=cache_base) for _ in range(2)]
+    )
+    with BuildSession():
+        container.build()
+    assert [(d._was_built, d.num_setups) for d in container.data] == [(True, 1)] * 2
+
+    with BuildRegistry():
+        registered = CountingData(cache_base=cache_base).build()
+        ignored_return_value = CountingData(cache_base=cache_base)
+        ignored_return_value.build()
+    assert ignored_return_value._was_built and ignored_return_value.num_setups == 1
+    assert registered.num_setups == 1
+
+
+def test_build_tracer(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    trace_file = f"{tmp_path}/trace.json"
+    with BuildTracer(trace_file) as tracer:
+        CountingData(cache_base=PrefixSuffix("test_cache", "traced")).build()
+    categories = {e.get("cat") for e in read_json(trace_file)["traceEvents"]}
+    assert {"node", "cache_check", "lock_wait", "build_cache"}.issubset(categories)
+    assert "CountingData-foo" in tracer.total_durations("node")
+
+
+@dataclass
+class ParentData(CountingData):
+    child: CountingData = None
+
+
+def test_plan(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "planned")
+
+    def create():
+        return ParentData(
+            value="parent",
+            child=CountingData(cache_base=cache_base),
+            cache_base=cache_base,
+        )
+
+    plan = create().plan(estimate_seconds=lambda node, status: 1.0)
+    assert [n.status for n in plan.nodes] == [BUILD, BUILD]
+    assert plan.estimated_seconds == 2.0
+    assert not any(os.path.exists(n.cache_dir) for n in plan.nodes)
+
+    create().build()
+    plan = create().plan()
+    assert [n.status for n in plan.nodes] == [LOAD, SKIP]
+    assert plan.estimated_seconds is None
+
+
+@dataclass
+class ContainerData(CountingData):
+    anything: Any = None
+
+
+def test_memoized_hash_equals_serialized_hash(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+
+    def serialized_hash(dc) -> str:
+        s = serialize_dataclass(dc, skip_keys=HASH_SKIP_KEYS, encode_for_hash=True)
+        return sha1(s.encode("utf-8")).hexdigest()
+
+    cache_base = PrefixSuffix("test_cache", "hashed")
+    leaf = CountingData(value="leaf", cache_base=cache_base)
+    graph = ParentData(
+        value="parent",
+        child=ParentData(value="child", child=leaf, cache_base=cache_base),
+        cache_base=cache_base,
+    )
+    with_containers = ContainerData(
+        anything={1: leaf, "x": [1.5, None, "ü", (True,)]}, cache_base=cache_base
+    )
+    root = BuildableList([graph, with_containers])
+    for node in [root, graph, with_containers, leaf]:
+        assert hash_dataclass(node) == serialized_hash(node)
+    assert HASH_MEMO_KEY in graph.child.__dict__
+    assert hash_dataclass(graph) == serialized_hash(graph)  # from memo
+
+    hash_before = hash_dataclass(root)
+    leaf.value = "changed"  # invalidates the memos of all ancestors
+    assert hash_dataclass(graph) == serialized_hash(graph)
+    assert hash_dataclass(root) == serialized_hash(root) != hash_before
+
+    with_containers.anything["x"].append(2)  # in-place, not noticed by __setattr__
+    assert hash_dataclass(root) == serialized_hash(root)
+
+
+@dataclass
+class DataWithBuildTimeDeps(CountingData):
+    raw: CountingData = None
+    vocab: CountingData = None
+    __build_time_only__: ClassVar[list[str]] = ["raw"]
+
+
+def test_build_time_only_children_are_not_loaded(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "build_time")
+
+    def create():
+        return DataWithBuildTimeDeps(
+            value="model",
+            raw=CountingData(value="raw", cache_base=cache_base),
+            vocab=CountingData(value="vocab", cache_base=cache_base),
+            cache_base=cache_base,
+        )
+
+    built = create().build()
+    assert built.raw.num_setups == 1 and built.vocab.num_setups == 1
+
+    plan = create().plan()
+    assert [(n.name, n.status) for n in plan.nodes] == [
+        ("model", LOAD),
+        ("raw", SKIP),
+        ("vocab", LOAD),
+    ]
+
+    checked = []
+    check = DataWithBuildTimeDeps._check_that_loading_went_well
+    monkeypatch.setattr(
+        DataWithBuildTimeDeps,
+        "_check_that_loading_went_well",
+        lambda self, loaded_dc: checked.append(loaded_dc) or check(self, loaded_dc),
+    )
+    loaded = create().build()
+    assert [type(dc) for dc in checked] == [DataWithBuildTimeDeps], "hash-verified"
+    assert checked[0].raw is loaded.raw, "build-time-only child not even decoded"
+    assert loaded.num_setups == 1
+    assert not loaded.raw._was_built and loaded.raw.num_setups == 0
+    assert loaded.vocab._was_built and loaded.vocab.num_setups == 1
+
+
+@dataclass
+class SleepingData(CountingData):
+    seconds: float = 0.0
+
+    def _build_cache(self):
+        sleep(self.seconds)
+
+
+@dataclass
+class SlowData(SleepingData):
+    seconds: float = 0.2
+
+
+def test_critical_path_first(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    monkeypatch.setitem(BASE_PATHES, "cache_root", str(tmp_path))
+    durations_file = f"{tmp_path}/build_durations.json"
+    assert build_durations().durations_file == durations_file, "default: in cache_root"
+
+    def create(suffix: str):
+        cache_base = PrefixSuffix("test_cache", suffix)
+        fast = SleepingData(value="fast", cache_base=cache_base)
+        slow_chain = ParentData(
+            value="parent",
+            child=SlowData(value="slow", cache_base=cache_base),
+            cache_base=cache_base,
+        )
+        slow_sibling = SleepingData(value="sibling", seconds=0.2, cache_base=cache_base)
+        return fast, slow_chain, slow_sibling
+
+    fast, slow_chain, slow_sibling = create("first")
+    assert critical_path_first([fast, slow_chain]) == [fast, slow_chain]
+    BuildableList([fast, slow_chain, slow_sibling]).build()
+
+    fast, slow_chain, slow_sibling = create("second")  # not cached yet, but history exists
+    assert estimate_seconds(slow_chain.child, BUILD) >= 0.2
+    ordered = critical_path_first([fast, slow_chain])
+    assert ordered[0] is slow_chain and ordered[1] is fast
+    ordered = critical_path_first([fast, slow_sibling])
+    assert ordered[0] is slow_sibling, "siblings of same class are told apart by their hash"
+
+    estimated = []
+    plan_status = CachedData._plan_status
+    monkeypatch.setattr(
+        CachedData, "_plan_status", lambda o: estimated.append(o) or plan_status(o)
+    )
+    with critical_path_scope():
+        critical_path_first([fast, slow_chain])
+        critical_path_first([slow_chain.child, fast])
+    assert len(estimated) == 3, "every node estimated once per scope"
+
+    build_durations().flush()
+    aggregates = read_json(durations_file)
+    assert sorted(aggregates["classes"].keys()) == [
+        "ParentData/build",
+        "SleepingData/build",
+        "SlowData/build",
+    ], "one aggregate per class and phase"
+    assert len(aggregates["nodes"]) == 4
+
+
+def test_resumable_buildable_list(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "resumable")
+
+    def create(values: list[str]):
+        return ResumableBuildableList(
+            [CountingData(value=v, cache_base=cache_base) for v in values],
+            progress_index=PrefixSuffix("test_cache", "progress.jsonl"),
+        )
+
+    create(["a", "b"]).build()  # crashed before "c" was built
+
+    resumed = create(["a", "b", "c"]).build()
+    raw = [list.__getitem__(resumed, k) for k in range(3)]
+    assert [o._was_built for o in raw] == [False, False, True], "a and b not touched"
+
+    assert resumed[0]._was_built and resumed[0].num_setups == 1
+    assert not list.__getitem__(resumed, 1)._was_built, "only accessed ones are loaded"
+    assert all(o._was_built for o in resumed)
+
+
+def test_graph_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "snapshotted")
+    snapshot_dir = f"{tmp_path}/snapshots"
+
+    def create(value: str = "parent"):
+        return ParentData(
+            value=value,
+            child=CountingData(cache_base=cache_base),
+            cache_base=cache_base,
+        )
+
+    built = build_with_snapshot(create(), snapshot_dir)
+    assert built.num_setups == 1 and built.child.num_setups == 1
+
+    shutil.rmtree(str(cache_base))  # restoring does not touch any cache
+    restored = build_with_snapshot(create(), snapshot_dir)
+    assert restored._was_built and restored.child._was_built
+    assert restored.num_setups == 1 and restored.child.num_setups == 1
+
+    other = build_with_snapshot(create(value="other"), snapshot_dir)
+    assert other.value == "other" and len(os.listdir(snapshot_dir)) == 2
+
+    monkeypatch.setitem(BASE_PATHES, "test_cache", f"{tmp_path}/elsewhere")
+    moved = build_with_snapshot(create(), snapshot_dir)
+    assert moved.child.num_setups == 1 and len(os.listdir(snapshot_dir)) == 3
+    assert str(moved.child.cache_dir).startswith(f"{tmp_path}/elsewhere")
+
+
+@dataclass
+class BuiltElsewhere(CountingData):
+    child: CountingData = None
+    built_by_pid: int = field(init=False, default=-1)
+    __build_in_subprocess__: ClassVar[bool] = True
+
+    def _build_cache(self):
+        assert self.child._was_built
+        self.built_by_pid = os.getpid()
+        write_json(self.prefix_cache_dir("data.json"), {"pid": self.built_by_pid})
+
+
+def test_build_cache_in_subprocess(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "subprocess")
+    child = CountingData(cache_base=cache_base)
+    built = BuiltElsewhere(child=child, cache_base=cache_base).build()
+    assert built.built_by_pid not in [-1, os.getpid()]
+    assert read_json(built.prefix_cache_dir("data.json"))["pid"] == built.built_by_pid
+    assert built.child is child and built.num_setups == 1
+
+
+def test_cache_manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr("misc_utils.cached_data.CACHE_MANIFEST", True)
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "manifested")
+
+    built = CountingData(cache_base=cache_base).build()
+    manifest = manifest_of(str(cache_base))
+    [entry] = manifest.entries()
+    assert entry.cache_key == os.path.basename(str(built.cache_dir))
+    assert entry.status == CACHED and entry.clazz == "CountingData"
+    assert entry.size_bytes > 0
+
+    with monkeypatch.context() as m:
+        m.setattr(
+            CountingData,
+            "_wait_until_cache_is_ready",
+            lambda self: pytest.fail("manifest should make lock-file stats unnecessary"),
+        )
+        loaded = CountingData(cache_base=cache_base).build()
+    assert loaded.num_setups == 1
+    assert manifest.entries()[0].last_access > entry.last_access
+
+    shutil.rmtree(str(built.cache_dir))  # by hand
+    assert not CountingData(cache_base=cache_base)._found_cached_data()
+    assert manifest.entries() == []
+    rebuilt = CountingData(cache_base=cache_base).build()
+    assert os.path.isfile(rebuilt.dataclass_json)
+    CountingData(cache_base=cache_base, overwrite_cache=True).build()
+    assert [e.status for e in manifest.entries()] == [CACHED]
+
+
+def test_claim_write_access(tmp_path):
+    file = f"{tmp_path}/data.json"
+    assert claim_write_access(file)
+    assert not claim_write_access(file), "already claimed"
+    write_json(file, {})
+    os.remove(f"{file}.lock.lock")
+    assert not claim_write_access(file), "already exists"
+
+
+def test_stale_claims_get_broken(tmp_path):
+    file = f"{tmp_path}/data.json"
+    claim_file = f"{file}.lock.lock"
+    dead = subprocess.Popen(["true"])
+    dead.wait()
+    write_json(claim_file, {"host": socket.gethostname(), "pid": dead.pid})
+    assert claim_write_access(file), "owner is dead"
+
+    assert not wait_until_removed(claim_file, timeout=0.05)
+    write_json(claim_file, {"host": "some-other-host", "pid": os.getpid()})
+    assert not claim_write_access(file), "owner on other host might be alive"
+    os.utime(claim_file, (time() - 3600, time() - 3600))
+    assert claim_write_access(file), "no heartbeat for an hour"
+
+
+BUILT_CACHES: list[str] = []
+
+
+@dataclass
+class SlowToCache(CountingData):
+    def _build_cache(self):
+        BUILT_CACHES.append(self.value)
+        sleep(0.3)
+
+
+def test_contended_cache_miss_resolves_fast(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "contended")
+    built = []
+    wake_ups = []
+    watcher_wait = _DirWatcher.wait
+
+    def spied_wait(watcher: _DirWatcher, timeout: float) -> bool:
+        woken = watcher_wait(watcher, timeout)
+        wake_ups.append(woken)
+        return woken
+
+    monkeypatch.setattr(_DirWatcher, "wait", spied_wait)
+
+    def build():
+        built.append(SlowToCache(value="contended", cache_base=cache_base).build())
+
+    threads = [threading.Thread(target=build) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert any(wake_ups), "waiters should be woken up by the watcher, not by polling"
+    assert BUILT_CACHES.count("contended") == 1
+    assert len(built) == 4 and all(b.num_setups == 1 for b in built)
+
+
+@dataclass
+class StagedData(CountingData):
+    fail: bool = False
+    built_in: str = field(default=None, init=False, repr=True)
+
+    def _build_cache(self):
+        self.built_in = str(self.cache_dir)
+        write_json(self.prefix_cache_dir("data.json"), {"value": self.value})
+        if self.fail:
+            raise RuntimeError("build failed")
+
+
+def test_staged_cache_build(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "staged")
+
+    built = StagedData(cache_base=cache_base).build()
+    assert built.built_in.endswith(STAGING_SUFFIX)
+    assert read_json(built.prefix_cache_dir("data.json")) == {"value": "foo"}
+    assert read_json(built.dataclass_json)["cache_dir"]["suffix"] == built.cache_dir.suffix
+    assert os.listdir(str(cache_base)) == [os.path.basename(str(built.cache_dir))]
+
+    with pytest.raises(RuntimeError):
+        StagedData(value="failing", fail=True, cache_base=cache_base).build()
+    assert len(os.listdir(str(cache_base))) == 1, "no half-written cache-dir"
+
+
+def test_cache_gc(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "collected")
+    cold, in_use, claimed, hot = (
+        str(CountingData(value=v, cache_base=cache_base).build().cache_dir)
+        for v in ["cold", "in_use", "claimed", "hot"]
+    )
+    for k, d in enumerate([cold, in_use, claimed]):
+        os.utime(d, (time() - 10 * 3600 + k, time() - 10 * 3600 + k))
+    assert [info.path for info in cache_dirs(str(cache_base))][-1] == hot
+
+    write_json(f"{claimed}.lock.lock", {})
+    with using_cache_dir(in_use):
+        evicted = collect_garbage(str(cache_base), max_bytes=0)
+    assert [info.path for info in evicted] == [cold]
+    assert sorted(os.listdir(str(cache_base))) == sorted(
+        os.path.basename(d) for d in [in_use, claimed, hot, f"{claimed}.lock.lock"]
+    )
+
+    reloaded = CountingData(value="in_use", cache_base=cache_base).build()
+    assert reloaded.num_setups == 1
+    assert collect_garbage(str(cache_base), max_age_seconds=3600) == []  # touched on load
+    assert not os.path.isdir(cold)
+    assert CountingData(value="cold", cache_base=cache_base).build().num_setups == 1
+
+
+def test_evicted_after_claim_failed_gets_rebuilt(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "evicted")
+    CountingData(cache_base=cache_base).build()
+
+    with monkeypatch.context() as m:
+
+        @contextmanager
+        def evicted_meanwhile(cache_dir: str):
+            m.undo()
+            shutil.rmtree(cache_dir)
+            with using_cache_dir(cache_dir) as exists:
+                yield exists
+
+        m.setattr("misc_utils.cached_data.using_cache_dir", evicted_meanwhile)
+        node = CountingData(cache_base=cache_base)
+        node.cache_dir = node.create_cache_dir_from_hashed_self()
+        node.maybe_build_cache()  # did not get the claim cause it exists
+    assert os.path.isfile(node.dataclass_json)
+
+
+def test_loading_read_only_cache(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "read_only")
+    CountingData(cache_base=cache_base).build()
+
+    def read_only_utime(path, *args, **kwargs):
+        raise OSError(errno.EROFS, "Read-only file system", path)
+
+    monkeypatch.setattr(os, "utime", read_only_utime)
+    assert CountingData(cache_base=cache_base).build().num_setups == 1
+
+
+@dataclass
+class LargeData(CountingData):
+    def _build_cache(self):
+        write_json(self.prefix_cache_dir("large.json"), {"data": "x" * 10_000})
+
+
+def test_content_store(tmp_path, monkeypatch):
+    monkeypatch.setattr("misc_utils.cached_data.CONTENT_STORE", True)
+    monkeypatch.setattr("misc_utils.content_store.CONTENT_STORE_MIN_BYTES", 1000)
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path / "cache"))
+    monkeypatch.setitem(BASE_PATHES, "EXPORT_CACHE_ROOT", str(tmp_path / "export"))
+    try:
+        cache_base = PrefixSuffix("test_cache", "deduplicated")
+        a, b = (
+            LargeData(value=v, cache_base=cache_base).build() for v in ["a", "b"]
+        )
+    finally:
+        del BASE_PATHES["EXPORT_CACHE_ROOT"]
+    large_a, large_b = (d.prefix_cache_dir("large.json") for d in [a, b])
+    assert os.path.samefile(large_a, large_b)
+    assert os.stat(large_a).st_nlink == 3  # a, b and the blob
+    assert read_json(large_b)["data"] == "x" * 10_000
+
+    exported = [
+        f"{tmp_path}/export/{d.cache_dir.suffix}/large.json" for d in [a, b]
+    ]
+    assert os.path.samefile(*exported), "exported caches share blobs as well"
+    assert os.stat(exported[0]).st_nlink == 3, "a, b and the blob in the export"
+
+    exported_inode = os.stat(exported[0]).st_ino
+    write_json(a.prefix_cache_dir("added.json"), {"added": True})
+    monkeypatch.setitem(BASE_PATHES, "EXPORT_CACHE_ROOT", str(tmp_path / "export"))
+    try:
+        LargeData(value="a", cache_base=cache_base).build()  # exports incrementally
+    finally:
+        del BASE_PATHES["EXPORT_CACHE_ROOT"]
+    assert os.stat(exported[0]).st_ino == exported_inode, "not exported again"
+    assert os.path.isfile(f"{tmp_path}/export/{a.cache_dir.suffix}/added.json")
+
+    store_dir = f"{tmp_path}/cache/{CONTENT_STORE_DIR_NAME}"
+    shutil.rmtree(str(a.cache_dir))
+    assert remove_orphaned_blobs(store_dir) == 0
+    shutil.rmtree(str(b.cache_dir))
+    assert remove_orphaned_blobs(store_dir) > 0
+
+
+def test_build_registry(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "registered")
+
+    def build(value: str) -> CountingData:
+        return ParentData(
+            value=value,
+            child=CountingData(value="shared", cache_base=cache_base),
+            cache_base=cache_base,
+        ).build()
+
+    with BuildRegistry(max_entries=3) as registry:
+        a = build("a")
+        assert build("a") is a and a.num_setups == 1
+        b = build("b")
+        assert b.child is a.child, "shared node is loaded only once"
+        assert registry.num_bytes > 0
+        build("a")  # a is now more recently used than b
+        build("c")  # evicts b
+        assert build("a") is a
+        assert build("b") is not b, "evicted -> loaded again"
+
+        shared = CountingData(value="shared", cache_base=cache_base).build()
+        overwritten = CountingData(
+            value="shared", cache_base=cache_base, overwrite_cache=True
+        ).build()
+        assert overwritten is not shared and overwritten.num_setups == 1
+        assert CountingData(value="shared", cache_base=cache_base).build() is overwritten
+    assert build("a") is not a
+
+
+def test_incremental_cache_export(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path / "cache"))
+    cache_base = PrefixSuffix("test_cache", "exported")
+    built = [LargeData(value=v, cache_base=cache_base).build() for v in "ab"]
+    os.makedirs(f"{built[0].cache_dir}-1234.staging")
+    write_json(f"{built[1].cache_dir}.lock.lock", {})
+    src, dst = str(tmp_path / "cache"), str(tmp_path / "export")
+
+    stats = export_cache_tree(src, dst)
+    assert stats.copied_files + stats.linked_files == 4 and stats.unchanged_files == 0
+    exported_large = f"{dst}/{built[0].cache_dir.suffix}/large.json"
+    assert read_json(exported_large) == read_json(built[0].prefix_cache_dir("large.json"))
+    assert not any(n.endswith((".staging", ".lock.lock")) for n in os.listdir(f"{dst}/exported"))
+
+    assert export_cache_tree(src, dst).unchanged_files == 4, "no-op"
+    assert not os.path.exists(f"{dst}/export_manifest.json"), "not within the cache-tree"
+    os.remove(f"{dst}.export_manifest.json")
+    stats = export_cache_tree(src, dst)
+    assert stats.unchanged_files == 4, "manifest seeded from the dst_dir"
+    assert os.path.isfile(f"{dst}.export_manifest.json")
+    write_json(built[0].prefix_cache_dir("large.json"), {"data": "changed"})
+    stats = export_cache_tree(src, dst, hardlinks=True)
+    assert stats.copied_files + stats.linked_files == 1
+    assert read_json(exported_large) == {"data": "changed"}
+
+
+def test_cache_metrics(tmp_path, monkeypatch):
+    monkeypatch.setitem(BASE_PATHES, "test_cache", str(tmp_path))
+    cache_base = PrefixSuffix("test_cache", "measured")
+    cache_metrics().reset()
+    monkeypatch.setattr(cache_metrics(), "measure_sizes", True)
+    for _ in range(2):
+        CountingData(cache_base=cache_base).build()
+
+    [entry] = cache_metrics().snapshot()
+    assert (entry["clazz"], entry["cache_base"]) == ("CountingData", "measured")
+    assert (entry["hits"], entry["misses"], entry["builds"]) == (1, 1, 1)
+    assert entry["bytes_built"] > 0
+    assert entry["load_seconds"]["count"] == entry["build_seconds"]["count"] == 1
+
+    prom = cache_metrics().to_prometheus()
+    labels = 'clazz="CountingData",cache_base="measured"'
+    assert f"cached_data_hits_total{{{labels}}} 1" in prom
+    assert f'cached_data_load_seconds_bucket{{{labels},le="+Inf"}} 1' in prom
+    cache_metrics().write(f"{tmp_path}/metrics.json")
+    assert read_json(f"{tmp_path}/metrics.json")["cache_metrics"] == [entry]
+
+
+def test_local_cache_tier(tmp_path, monkeypatch, request):
+    monkeypatch.setattr("misc_utils.cache_tiers.LOCAL_CACHE_TIER", f"{tmp_path}/ssd")
+    monkeypatch.setattr("misc_utils.cache_tiers._LOCAL_TIER", None)
+    monkeypatch.setitem(BASE_PATHES, "test_cache", f"{tmp_path}/nfs")
+    monkeypatch.setitem(BASE_PATHES, "local_tier", f"{tmp_path}/ssd")
+    tier = local_tier()
+    request.addfinalizer(tier.stop)
+    cache_base = PrefixSuffix("test_cache", "tiered")
+    data = CountingData(cache_base=cache_base).build()
+    shared_dir = str(data.cache_dir)
+
+    loaded = CountingData(cache_base=cache_base).build()  # promotes in background
+    assert str(loaded.cache_dir) == shared_dir
+    tier.stop()  # waits for the promotion
+
+    loaded = CountingData(cache_base=cache_base).build()
+    local_json = loaded.prefix_cache_dir(CachedData._json_file_name)
+    assert local_json.startswith(f"{tmp_path}/ssd/")
+    assert str(loaded.cache_dir) == shared_dir, "never leaks into dataclass.json of parents"
+    assert "ssd" not in serialize_dataclass(loaded)
+    assert loaded.value == data.value and loaded.num_setups == 1
+    assert os.path.isdir(shared_dir), "shared tier stays the source of truth"
+
+    os.utime(shared_dir, (0, 0))
+    CountingData(cache_base=cache_base).build()
+    assert time() - os.path.getmtime(shared_dir) < 60, "local hits count as access of the shared one"
+
+    shared_json = f"{shared_dir}/{CachedData._json_file_name}"
+    shutil.copy(shared_json, f"{shared_json}.tmp")
+    os.replace(f"{shared_json}.tmp", shared_json)  # overwritten by another host
+    loaded = CountingData(cache_base=cache_base).build()
+    assert loaded.prefix_cache_dir("x") == f"{shared_dir}/x", "stale local copy not served"
+    tier.stop()  # waits for the promotion of the current one
+    assert os.path.isfile(local_json)
+
+    tier.max_bytes = 0
+    tier.enforce_budget(min_idle_seconds=0)
+    assert len(tier.local_copies()) == 0
+    loaded = CountingData(cache_base=cache_base).build()
+    assert loaded.prefix_cache_dir("x") == f"{shared_dir}/x"
+    tier.stop()  # promoted again
+
+    with monkeypatch.context() as m:
+        m.setattr(shutil, "copytree", lambda src, dst: os.makedirs(dst) or 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            tier.promote(shared_dir, f"{tmp_path}/ssd/failing/copy")
+    assert os.listdir(f"{tmp_path}/ssd/failing") == [], "no staging-dir left behind"
+
+    assert os.path.isfile(local_json)
+    CountingData(cache_base=cache_base, overwrite_cache=True).build()
+    assert not os.path.isfile(local_json), "overwritten caches are not served locally"